@@ -0,0 +1,288 @@
+"""Local stand-ins for the Spotify Web API and the OpenAI chat completions API.
+
+Both are served by one app: Spotify under /spotify/v1 and OpenAI under
+/openai/v1. Every request waits for the configured latency and is rejected
+with a 429 at the configured rate, so the backend's rate limiting, retries
+and concurrency can be measured offline.
+
+    python -m bench.fake_services --port 8100 --spotify-latency 0.05 --spotify-429-rate 0.02
+"""
+import re
+import json
+import time
+import uuid
+import random
+import asyncio
+import hashlib
+import argparse
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+class Fault:
+    """Injected latency (mean +- jitter, in seconds) and 429 rate for one service"""
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, rate_429: float = 0.0, retry_after: float = 1.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+
+    async def apply(self):
+        """Sleep for the latency, then return a 429 response or None"""
+        delay = max(0.0, self.latency + random.uniform(-self.jitter, self.jitter))
+        if delay:
+            await asyncio.sleep(delay)
+        if self.rate_429 and random.random() < self.rate_429:
+            return JSONResponse(
+                status_code=429,
+                content={"error": {"status": 429, "message": "API rate limit exceeded"}},
+                headers={"Retry-After": str(self.retry_after)}
+            )
+        return None
+
+
+ARTIST_COUNT = 200
+GENRES = ('indie rock', 'synthwave', 'jazz', 'hip hop', 'dream pop', 'techno', 'folk', 'k-pop')
+
+
+def fake_artist(index: int) -> dict:
+    return {
+        'id': f'artist{index:04d}',
+        'name': f'Artist {index}',
+        'popularity': 100 - index % 100,
+        'genres': [GENRES[index % len(GENRES)], GENRES[(index * 7) % len(GENRES)]],
+        'images': [
+            {'url': f'https://img.example/{index}/640', 'width': 640, 'height': 640},
+            {'url': f'https://img.example/{index}/320', 'width': 320, 'height': 320},
+        ],
+    }
+
+
+def fake_track(name: str, artist: str, index: int = 0) -> dict:
+    track_id = hashlib.sha1(f'{name}|{artist}|{index}'.encode()).hexdigest()[:22]
+    return {
+        'id': track_id,
+        'name': name,
+        'uri': f'spotify:track:{track_id}',
+        'popularity': 50,
+        'artists': [{'id': 'artist0000', 'name': artist}],
+    }
+
+
+def create_app(spotify: Fault, openai: Fault, stream_chunk_delay: float = 0.0) -> FastAPI:
+    app = FastAPI()
+    counters = {'spotify': 0, 'openai': 0, 'spotify_429': 0, 'openai_429': 0}
+    playlists = {}
+
+    @app.middleware('http')
+    async def inject_faults(request: Request, call_next):
+        service = 'spotify' if request.url.path.startswith('/spotify/') else 'openai'
+        if not request.url.path.startswith(('/spotify/', '/openai/')):
+            return await call_next(request)
+        counters[service] += 1
+        rejected = await (spotify if service == 'spotify' else openai).apply()
+        if rejected is not None:
+            counters[f'{service}_429'] += 1
+            return rejected
+        return await call_next(request)
+
+    @app.get('/stats')
+    async def stats():
+        return counters
+
+    @app.get('/spotify/v1/me')
+    async def me():
+        return {'id': 'bench-user', 'display_name': 'Bench User'}
+
+    @app.get('/spotify/v1/me/top/artists')
+    async def top_artists(limit: int = 20, offset: int = 0, time_range: str = 'medium_term'):
+        # Shift the ranking per time range so merging has something to do
+        shift = {'short_term': 7, 'medium_term': 3, 'long_term': 0}.get(time_range, 0)
+        indexes = range(offset, min(offset + limit, ARTIST_COUNT))
+        return {
+            'items': [fake_artist((index + shift) % ARTIST_COUNT) for index in indexes],
+            'total': ARTIST_COUNT,
+            'limit': limit,
+            'offset': offset,
+        }
+
+    @app.get('/spotify/v1/artists/{artist_id}/related-artists')
+    async def related_artists(artist_id: str):
+        index = int(artist_id.removeprefix('artist') or 0)
+        return {'artists': [fake_artist((index + step) % ARTIST_COUNT) for step in (1, 2, 3, 5, 8)]}
+
+    @app.get('/spotify/v1/artists/{artist_id}/top-tracks')
+    async def top_tracks(artist_id: str):
+        index = int(artist_id.removeprefix('artist') or 0)
+        return {'tracks': [fake_track(f'Song {position}', f'Artist {index}') for position in range(10)]}
+
+    @app.get('/spotify/v1/search')
+    async def search(q: str, type: str = 'track', limit: int = 10, offset: int = 0):
+        match = re.search(r'track:(.+?)(?: artist:(.+))?$', q)
+        if q.startswith('artist:'):
+            # An artist's catalog, most popular first
+            items = [fake_track(f'Song {index}', q.removeprefix('artist:'), index) for index in range(limit)]
+        else:
+            name, artist = (match.group(1), match.group(2) or '') if match else (q, '')
+            items = [fake_track(name, artist, index) for index in range(limit)]
+        return {'tracks': {'items': items, 'total': len(items), 'limit': limit, 'offset': offset}}
+
+    def playlist_response(playlist_id: str) -> dict:
+        playlist = playlists[playlist_id]
+        return {
+            'id': playlist_id,
+            'name': playlist['name'],
+            'snapshot_id': playlist['snapshot_id'],
+            'external_urls': {'spotify': f'https://open.spotify.example/playlist/{playlist_id}'},
+            'tracks': {'total': len(playlist['uris'])},
+        }
+
+    def changed(playlist_id: str) -> dict:
+        playlists[playlist_id]['snapshot_id'] = uuid.uuid4().hex
+        return {'snapshot_id': playlists[playlist_id]['snapshot_id']}
+
+    def not_found() -> JSONResponse:
+        return JSONResponse(status_code=404, content={'error': {'status': 404, 'message': 'Not found.'}})
+
+    @app.post('/spotify/v1/users/{user_id}/playlists')
+    async def create_playlist(user_id: str, request: Request):
+        body = await request.json()
+        playlist_id = uuid.uuid4().hex[:22]
+        playlists[playlist_id] = {'name': body.get('name'), 'uris': [], 'snapshot_id': uuid.uuid4().hex}
+        return playlist_response(playlist_id)
+
+    @app.get('/spotify/v1/playlists/{playlist_id}')
+    async def get_playlist(playlist_id: str):
+        if playlist_id not in playlists:
+            return not_found()
+        return {**playlist_response(playlist_id), 'uris': playlists[playlist_id]['uris']}
+
+    @app.put('/spotify/v1/playlists/{playlist_id}')
+    async def change_playlist_details(playlist_id: str, request: Request):
+        if playlist_id not in playlists:
+            return not_found()
+        body = await request.json()
+        playlists[playlist_id]['name'] = body.get('name', playlists[playlist_id]['name'])
+        return None
+
+    # Mirrors the Web API limits: at most 100 items per add, replace or remove
+    @app.api_route('/spotify/v1/playlists/{playlist_id}/tracks', methods=['POST', 'PUT', 'DELETE'])
+    async def playlist_tracks(playlist_id: str, request: Request, position: int = None):
+        if playlist_id not in playlists:
+            return not_found()
+        body = await request.json()
+        uris = playlists[playlist_id]['uris']
+        items = body if isinstance(body, list) else body.get('uris') or body.get('tracks') or []
+        if len(items) > 100:
+            return JSONResponse(status_code=400, content={'error': {'status': 400, 'message': 'Too many ids requested'}})
+        if request.method == 'POST':
+            position = len(uris) if position is None else position
+            uris[position:position] = items
+        elif request.method == 'DELETE':
+            removed = {item['uri'] for item in items}
+            uris[:] = [uri for uri in uris if uri not in removed]
+        elif 'range_start' in body:
+            start, length, before = body['range_start'], body.get('range_length', 1), body['insert_before']
+            block = uris[start:start + length]
+            del uris[start:start + length]
+            before = before - length if before > start else before
+            uris[before:before] = block
+        else:
+            uris[:] = items
+        return changed(playlist_id)
+
+    @app.post('/openai/v1/chat/completions')
+    async def chat_completions(request: Request):
+        body = await request.json()
+        prompt = '\n'.join(message['content'] for message in body['messages'])
+        match = re.search(r'exactly (\d+) tracks', prompt)
+        count = int(match.group(1)) if match else 10
+        # Unique tracks every time, so top-ups never return duplicates
+        batch = uuid.uuid4().hex[:6]
+        content = json.dumps({
+            'name': 'Benchmark Mix',
+            'tracks': [{'name': f'Track {batch}-{index}', 'artist': f'Artist {index % 20}'} for index in range(count)],
+        })
+        completion_id = f'chatcmpl-{uuid.uuid4().hex}'
+        created = int(time.time())
+        model = body.get('model', 'gpt-3.5-turbo')
+
+        if not body.get('stream'):
+            return {
+                'id': completion_id,
+                'object': 'chat.completion',
+                'created': created,
+                'model': model,
+                'choices': [{
+                    'index': 0,
+                    'message': {'role': 'assistant', 'content': content},
+                    'finish_reason': 'stop',
+                }],
+                'usage': {
+                    'prompt_tokens': len(prompt) // 4,
+                    'completion_tokens': len(content) // 4,
+                    'total_tokens': (len(prompt) + len(content)) // 4,
+                },
+            }
+
+        async def chunks():
+            for start in range(0, len(content), 16):
+                chunk = {
+                    'id': completion_id,
+                    'object': 'chat.completion.chunk',
+                    'created': created,
+                    'model': model,
+                    'choices': [{'index': 0, 'delta': {'content': content[start:start + 16]}, 'finish_reason': None}],
+                }
+                yield f'data: {json.dumps(chunk)}\n\n'
+                if stream_chunk_delay:
+                    await asyncio.sleep(stream_chunk_delay)
+            yield 'data: [DONE]\n\n'
+
+        return StreamingResponse(chunks(), media_type='text/event-stream')
+
+    return app
+
+
+def add_fault_arguments(parser: argparse.ArgumentParser):
+    for service in ('spotify', 'openai'):
+        parser.add_argument(f'--{service}-latency', type=float, default=0.05 if service == 'spotify' else 0.5,
+                            help=f'Mean {service} response latency in seconds')
+        parser.add_argument(f'--{service}-jitter', type=float, default=0.0,
+                            help=f'Uniform jitter added to the {service} latency, in seconds')
+        parser.add_argument(f'--{service}-429-rate', type=float, default=0.0,
+                            help=f'Fraction of {service} requests rejected with a 429')
+        parser.add_argument(f'--{service}-retry-after', type=float, default=1.0,
+                            help=f'Retry-After seconds sent with {service} 429 responses')
+
+
+def faults_from_args(args: argparse.Namespace):
+    return tuple(
+        Fault(
+            latency=getattr(args, f'{service}_latency'),
+            jitter=getattr(args, f'{service}_jitter'),
+            rate_429=getattr(args, f'{service}_429_rate'),
+            retry_after=getattr(args, f'{service}_retry_after'),
+        )
+        for service in ('spotify', 'openai')
+    )
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8100)
+    parser.add_argument('--stream-chunk-delay', type=float, default=0.0,
+                        help='Seconds between streamed completion chunks')
+    add_fault_arguments(parser)
+    args = parser.parse_args()
+    spotify, openai = faults_from_args(args)
+    uvicorn.run(create_app(spotify, openai, args.stream_chunk_delay), host=args.host, port=args.port, log_level='warning')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,335 @@
+"""Benchmark the backend against the local Spotify and OpenAI stand-ins.
+
+Starts bench.fake_services and the FastAPI app from main.py on a scratch
+database and token directory, drives each scenario at each concurrency level
+and reports throughput and p50/p95/p99 latency. Background jobs (sync,
+upload) are timed from submission until they complete. Results are written
+as JSON, and a previous result can be passed with --compare to see the change.
+
+    cd backend
+    python -m bench.run --concurrency 1,8,32 --requests 64 --output bench-results.json
+    python -m bench.run --compare bench-results.json
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import socket
+import asyncio
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+from .fake_services import add_fault_arguments
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+SCENARIOS = ('sync', 'artists', 'generate', 'upload')
+JOB_POLL_INTERVAL = 0.05
+STARTUP_TIMEOUT = 30.0
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, round(fraction * len(sorted_values) + 0.5))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> dict:
+    latencies = sorted(latencies)
+    return {
+        'requests': len(latencies) + errors,
+        'errors': errors,
+        'throughput': len(latencies) / elapsed if elapsed else 0.0,
+        'mean': sum(latencies) / len(latencies) if latencies else 0.0,
+        'p50': percentile(latencies, 0.50),
+        'p95': percentile(latencies, 0.95),
+        'p99': percentile(latencies, 0.99),
+        'max': latencies[-1] if latencies else 0.0,
+    }
+
+
+class Scenario:
+    """The benchmarked operations; each returns once the work has fully completed"""
+
+    def __init__(self, client: httpx.AsyncClient, track_count: int, upload_tracks: int):
+        self.client = client
+        self.track_count = track_count
+        self.upload_tracks = upload_tracks
+
+    async def wait_for_job(self, response: httpx.Response):
+        response.raise_for_status()
+        status_url = response.json()['status_url']
+        while True:
+            job = (await self.client.get(status_url)).json()
+            if job['status'] == 'completed':
+                return job
+            if job['status'] == 'failed':
+                raise RuntimeError(job['error'])
+            await asyncio.sleep(JOB_POLL_INTERVAL)
+
+    async def sync(self):
+        response = await self.client.post(
+            '/api/spotify/sync',
+            params=[('time_ranges', 'short_term'), ('time_ranges', 'medium_term'), ('time_ranges', 'long_term')]
+        )
+        await self.wait_for_job(response)
+
+    async def artists(self):
+        response = await self.client.get('/api/artists', params={'fields': 'id,name,popularity,status,thumbnail'})
+        response.raise_for_status()
+
+    async def generate(self):
+        # A unique request every time, so the playlist cache is not measured
+        response = await self.client.post('/api/playlist/generate', json={
+            'request': f'benchmark playlist {uuid.uuid4().hex}',
+            'track_count': self.track_count,
+        })
+        response.raise_for_status()
+
+    async def upload(self):
+        batch = uuid.uuid4().hex[:8]
+        response = await self.client.post('/api/playlist/upload', json={
+            'name': f'Benchmark {batch}',
+            'tracks': [
+                {'name': f'Upload {batch} {index}', 'artist': f'Artist {index % 20}'}
+                for index in range(self.upload_tracks)
+            ],
+        })
+        await self.wait_for_job(response)
+
+
+async def run_level(scenario: Scenario, name: str, concurrency: int, requests: int) -> dict:
+    operation = getattr(scenario, name)
+    remaining = iter(range(requests))
+    latencies = []
+    errors = []
+
+    async def worker():
+        for _ in remaining:
+            start = time.perf_counter()
+            try:
+                await operation()
+            except Exception as e:
+                errors.append(str(e))
+            else:
+                latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    result = summarize(latencies, len(errors), time.perf_counter() - start)
+    if errors:
+        result['first_error'] = errors[0][:200]
+    return result
+
+
+def start_process(args: List[str], env: dict) -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, *args], cwd=BACKEND_DIR, env=env)
+
+
+async def wait_until_ready(url: str, process: subprocess.Popen):
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"{url} exited with code {process.returncode}")
+            try:
+                if (await client.get(url)).status_code < 500:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.1)
+    raise RuntimeError(f"{url} did not start within {STARTUP_TIMEOUT:.0f}s")
+
+
+async def client_get_json(url: str) -> dict:
+    async with httpx.AsyncClient() as client:
+        return (await client.get(url)).json()
+
+
+def write_token(tokens_dir: Path):
+    tokens_dir.mkdir(parents=True, exist_ok=True)
+    now = int(time.time())
+    with open(tokens_dir / 'spotify_token.json', 'w') as f:
+        json.dump({
+            'access_token': 'bench-access-token',
+            'refresh_token': 'bench-refresh-token',
+            'token_type': 'Bearer',
+            'expires_in': 86400,
+            'expires_at': now + 86400,
+            'scope': 'playlist-modify-public playlist-modify-private user-top-read',
+        }, f)
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run_benchmark(args: argparse.Namespace) -> dict:
+    fake_port = free_port()
+    app_port = free_port()
+    fake_url = f'http://127.0.0.1:{fake_port}'
+    app_url = f'http://127.0.0.1:{app_port}'
+
+    with tempfile.TemporaryDirectory(prefix='playlist-bench-') as scratch:
+        scratch = Path(scratch)
+        write_token(scratch / 'tokens')
+        env = {
+            **os.environ,
+            'DATABASE_PATH': str(scratch / 'artists.db'),
+            'SPOTIFY_TOKEN_DIR': str(scratch / 'tokens'),
+            'SPOTIFY_API_URL': f'{fake_url}/spotify/v1',
+            'SPOTIFY_CLIENT_ID': 'bench',
+            'SPOTIFY_CLIENT_SECRET': 'bench',
+            'SPOTIFY_REDIRECT_URI': f'{app_url}/api/spotify/callback',
+            'OPENAI_BASE_URL': f'{fake_url}/openai/v1',
+            'OPENAI_API_KEY': 'bench',
+            'LOG_LEVEL': os.getenv('LOG_LEVEL', 'WARNING'),
+            # spotipy logs every injected 429 as an error
+            'LOG_LEVELS': os.getenv('LOG_LEVELS', 'spotipy=CRITICAL,httpx=WARNING'),
+        }
+        for item in args.app_env:
+            key, _, value = item.partition('=')
+            env[key] = value
+
+        fault_args = []
+        for service in ('spotify', 'openai'):
+            for option in ('latency', 'jitter', '429_rate', 'retry_after'):
+                fault_args += [f"--{service}-{option.replace('_', '-')}", str(getattr(args, f'{service}_{option}'))]
+        fake = start_process(['-m', 'bench.fake_services', '--port', str(fake_port), *fault_args], env)
+        app = start_process(
+            ['-m', 'uvicorn', 'main:app', '--port', str(app_port), '--log-level', 'warning', '--no-access-log'], env
+        )
+        try:
+            await wait_until_ready(f'{fake_url}/stats', fake)
+            await wait_until_ready(f'{app_url}/health/ready', app)
+            startup_seconds = (await client_get_json(f'{app_url}/health/ready'))['startup_seconds']
+            print(f"App ready {startup_seconds * 1000:.0f}ms after import", flush=True)
+
+            results: Dict[str, Dict[str, dict]] = {}
+            limits = httpx.Limits(max_connections=max(args.concurrency) * 2)
+            async with httpx.AsyncClient(base_url=app_url, timeout=args.timeout, limits=limits) as client:
+                scenario = Scenario(client, args.track_count, args.upload_tracks)
+                # Sync once up front so the read scenarios have a catalog
+                await scenario.sync()
+                for name in args.scenarios:
+                    results[name] = {}
+                    for concurrency in args.concurrency:
+                        requests = max(args.requests, concurrency)
+                        result = await run_level(scenario, name, concurrency, requests)
+                        results[name][str(concurrency)] = result
+                        print(
+                            f"{name:>9} c={concurrency:<4} {result['throughput']:8.1f} req/s  "
+                            f"p50 {result['p50'] * 1000:8.1f}ms  p95 {result['p95'] * 1000:8.1f}ms  "
+                            f"p99 {result['p99'] * 1000:8.1f}ms  errors {result['errors']}",
+                            flush=True
+                        )
+                fake_stats = (await client.get(f'{fake_url}/stats')).json()
+        finally:
+            for process in (app, fake):
+                process.terminate()
+            for process in (app, fake):
+                try:
+                    process.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+
+    return {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'requests': args.requests,
+            'concurrency': args.concurrency,
+            'track_count': args.track_count,
+            'upload_tracks': args.upload_tracks,
+            'faults': {
+                service: {
+                    option: getattr(args, f'{service}_{option}')
+                    for option in ('latency', 'jitter', '429_rate', 'retry_after')
+                }
+                for service in ('spotify', 'openai')
+            },
+            'app_env': args.app_env,
+            'startup_seconds': startup_seconds,
+            'upstream_calls': fake_stats,
+        },
+        'results': results,
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> bool:
+    """Print the change against a baseline; False if any p95 regressed past the threshold"""
+    print(f"\nCompared with {baseline['meta'].get('commit') or 'baseline'} ({baseline['meta'].get('timestamp')})")
+    ok = True
+    for name, levels in current['results'].items():
+        for concurrency, result in levels.items():
+            before = baseline.get('results', {}).get(name, {}).get(concurrency)
+            if before is None:
+                continue
+            changes = []
+            for metric in ('throughput', 'p50', 'p95', 'p99'):
+                if before[metric]:
+                    changes.append(f"{metric} {(result[metric] - before[metric]) / before[metric]:+7.1%}")
+            regressed = before['p95'] and (result['p95'] - before['p95']) / before['p95'] > threshold
+            ok = ok and not regressed
+            print(f"{name:>9} c={concurrency:<4} {'  '.join(changes)}{'  REGRESSED' if regressed else ''}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scenarios', type=lambda value: value.split(','), default=list(SCENARIOS),
+                        help=f"Comma-separated scenarios (default {','.join(SCENARIOS)})")
+    parser.add_argument('--concurrency', type=lambda value: [int(level) for level in value.split(',')],
+                        default=[1, 8, 32], help='Comma-separated concurrency levels (default 1,8,32)')
+    parser.add_argument('--requests', type=int, default=64, help='Operations per scenario and level')
+    parser.add_argument('--track-count', type=int, default=10, help='Tracks per generated playlist')
+    parser.add_argument('--upload-tracks', type=int, default=20, help='Tracks per uploaded playlist')
+    parser.add_argument('--timeout', type=float, default=120.0, help='HTTP timeout in seconds')
+    parser.add_argument('--app-env', action='append', default=[], metavar='KEY=VALUE',
+                        help='Extra environment for the backend, e.g. SPOTIFY_RATE_LIMIT=50')
+    parser.add_argument('--output', help='Write the results as JSON to this file')
+    parser.add_argument('--compare', help='A previous results file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='Relative p95 increase that counts as a regression (default 0.2)')
+    add_fault_arguments(parser)
+    args = parser.parse_args()
+
+    invalid = [name for name in args.scenarios if name not in SCENARIOS]
+    if invalid:
+        parser.error(f"Unknown scenario(s): {', '.join(invalid)}")
+
+    results = asyncio.run(run_benchmark(args))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nWrote {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if not compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
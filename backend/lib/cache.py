@@ -0,0 +1,86 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+# Sentinel returned on a cache miss, so that None can be cached as a value
+MISSING = object()
+
+# Minimum seconds between purges of a cache's SQLite table
+CACHE_PURGE_INTERVAL = float(os.getenv('CACHE_PURGE_INTERVAL', '3600'))
+
+
+class PurgeThrottle:
+    """Decides when a cache's SQLite table is due for a purge.
+
+    The tables only grow on writes, so caches ask on every write and purge
+    at most once per `interval` seconds, starting with the first write.
+    """
+
+    def __init__(self, interval: float = CACHE_PURGE_INTERVAL):
+        self.interval = interval
+        self._purged_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def due(self, now: float) -> bool:
+        with self._lock:
+            if self._purged_at is not None and now - self._purged_at < self.interval:
+                return False
+            self._purged_at = now
+            return True
+
+
+class LRUCache:
+    """Thread-safe in-process LRU cache with per-entry TTL and hit/miss counters"""
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, tuple[Any, Optional[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = MISSING) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is None or expires_at > time.time():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.time() + ttl if ttl is not None else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: Hashable):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
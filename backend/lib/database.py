@@ -1,36 +1,167 @@
 import sqlite3
 import json
+import base64
+import asyncio
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
 import os
-from typing import List, Optional
+from typing import Dict, Iterable, List, Optional
 import logging
-from sqlalchemy import text
+
+from .cache import LRUCache, MISSING
+from .metrics import DB_QUERY_DURATION
 
 # Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('database.log'),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
 
-logger.info("Database initialized!!!!!")
+DATABASE_PATH = os.getenv('DATABASE_PATH', 'data/artists.db')
+DATABASE_WORKERS = int(os.getenv('DATABASE_WORKERS', '4'))
+# Seconds a connection waits on a lock held by another connection or process
+DATABASE_BUSY_TIMEOUT = float(os.getenv('DATABASE_BUSY_TIMEOUT', '5'))
+
+COUNT_CACHE_TTL = float(os.getenv('DATABASE_COUNT_CACHE_TTL', '30'))
+
+ARTIST_FIELDS = (
+    'id', 'name', 'popularity', 'status', 'images', 'thumbnail', 'time_ranges', 'genres', 'related',
+    'version', 'last_updated'
+)
+ARTIST_STATUSES = ('not_ranked', 'like', 'dislike', 'neutral')
+JSON_FIELDS = ('time_ranges', 'genres', 'related')
+# Artist cards are 150px wide, 300px covers high-DPI screens
+THUMBNAIL_MIN_WIDTH = 300
+
+PRAGMAS = (
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA cache_size=-16000',
+    'PRAGMA mmap_size=134217728',
+    'PRAGMA foreign_keys=ON',
+)
+
+
+
+def encode_cursor(popularity: int, artist_id: str) -> str:
+    payload = json.dumps([popularity, artist_id]).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        popularity, artist_id = json.loads(base64.urlsafe_b64decode(padded))
+        return int(popularity), str(artist_id)
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+def select_fields(fields: Optional[Iterable[str]]) -> tuple:
+    """Validate a projection, defaulting to every artist field"""
+    if not fields:
+        return ARTIST_FIELDS
+    fields = tuple(dict.fromkeys(fields))
+    unknown = [field for field in fields if field not in ARTIST_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown artist field(s): {', '.join(unknown)}")
+    return fields
+
+
+def pick_thumbnail(images: list) -> Optional[str]:
+    """Return the smallest image URL that is still sharp on the artist card"""
+    if not images:
+        return None
+    large_enough = [image for image in images if (image.get('width') or 0) >= THUMBNAIL_MIN_WIDTH]
+    if large_enough:
+        return min(large_enough, key=lambda image: image['width'])['url']
+    return images[0].get('url')
+
 class Database:
-    def __init__(self, db_path="data/artists.db"):
+    """SQLite storage in WAL mode.
+
+    Reads go through one connection per thread, so they never wait on a
+    writer; writes share a single connection serialized by a lock. Use
+    `run` from async code to execute any method on the database thread pool.
+    """
+
+    def __init__(self, db_path=DATABASE_PATH, max_workers: int = DATABASE_WORKERS):
         # Ensure the data directory exists
-        os.makedirs(os.path.dirname(db_path), exist_ok=True)
-        
-        self.conn = sqlite3.connect(db_path)
-        self.conn.row_factory = sqlite3.Row
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+
+        self.db_path = db_path
+        self._local = threading.local()
+        self._readers = []
+        self._readers_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._write_conn = self._connect()
+        # Counts also expire on a timer to pick up writes from other workers
+        self._count_cache = LRUCache(maxsize=16, ttl=COUNT_CACHE_TTL)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='db')
+        self._closed = False
         self.create_tables()
         logger.info(f"Database initialized at {db_path}")
 
+    def _connect(self) -> sqlite3.Connection:
+        # Autocommit mode: transactions are opened explicitly by _writer
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=DATABASE_BUSY_TIMEOUT,
+            isolation_level=None,
+            check_same_thread=False
+        )
+        conn.row_factory = sqlite3.Row
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def _reader(self) -> sqlite3.Connection:
+        """Return this thread's read connection, opening it on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._connect()
+            conn.execute('PRAGMA query_only=ON')
+            self._local.conn = conn
+            with self._readers_lock:
+                self._readers.append(conn)
+        return conn
+
+    @contextmanager
+    def _writer(self):
+        """Serialize writers and wrap the block in a single transaction"""
+        with self._write_lock:
+            conn = self._write_conn
+            # IMMEDIATE takes the write lock up front, so concurrent worker
+            # processes queue on busy_timeout instead of failing to upgrade
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield conn
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            conn.execute('COMMIT')
+            self._count_cache.clear()
+
+    async def run(self, func, *args, **kwargs):
+        """Run a blocking call on the database thread pool.
+
+        Only this database's own methods are timed as db operations; other
+        callables (e.g. the similarity engine) share the pool untimed.
+        """
+        loop = asyncio.get_running_loop()
+        call = functools.partial(func, *args, **kwargs)
+        if getattr(func, '__self__', None) is not self:
+            return await loop.run_in_executor(self._executor, call)
+        with DB_QUERY_DURATION.time('db', operation=func.__qualname__):
+            return await loop.run_in_executor(self._executor, call)
+
     def create_tables(self):
-        cursor = self.conn.cursor()
-        
+        with self._writer() as conn:
+            self._create_tables(conn.cursor())
+        logger.info("Database tables created/verified")
+
+    def _create_tables(self, cursor):
         # Create artists table
         cursor.execute('''
         CREATE TABLE IF NOT EXISTS artists (
@@ -42,137 +173,623 @@ class Database:
             last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
         ''')
-        
-        self.conn.commit()
-        logger.info("Database tables created/verified")
+
+        added = self._add_missing_columns(cursor, 'artists', {
+            'time_ranges': 'TEXT',
+            'thumbnail': 'TEXT',
+            'genres': 'TEXT',
+            'related': 'TEXT',
+            'version': 'INTEGER NOT NULL DEFAULT 0'
+        })
+        if 'thumbnail' in added:
+            cursor.execute('SELECT id, images FROM artists WHERE images IS NOT NULL')
+            cursor.executemany('UPDATE artists SET thumbnail = ? WHERE id = ?', [
+                (pick_thumbnail(json.loads(row['images'])), row['id'])
+                for row in cursor.fetchall()
+            ])
+
+        # Keyset pagination indexes, matching ORDER BY popularity DESC, id DESC
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_artists_status_popularity ON artists (status, popularity, id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_artists_popularity ON artists (popularity, id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_artists_version ON artists (version)')
+
+        # Catalog version: bumped by every artist write and stamped on the changed rows.
+        # reset_version is the version of the last delete, which deltas cannot express.
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        )
+        ''')
+        cursor.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('catalog_version', 0), ('reset_version', 0)")
+
+        # Create track resolution cache table (track_id NULL means "not found")
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS track_cache (
+            track_key TEXT PRIMARY KEY,
+            track_id TEXT,
+            cached_at REAL NOT NULL
+        )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_track_cache_cached_at ON track_cache (cached_at)')
+
+        # Create background jobs table
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',
+            progress INTEGER NOT NULL DEFAULT 0,
+            total INTEGER,
+            message TEXT,
+            params TEXT,
+            result TEXT,
+            error TEXT,
+            created_at TIMESTAMP NOT NULL,
+            updated_at TIMESTAMP NOT NULL
+        )
+        ''')
+        # The JobManager instance that runs the job, and when it last reported being alive
+        self._add_missing_columns(cursor, 'jobs', {
+            'owner': 'TEXT',
+            'heartbeat_at': 'REAL'
+        })
+
+        # Create generated playlist cache table
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS playlist_cache (
+            cache_key TEXT PRIMARY KEY,
+            response TEXT NOT NULL,
+            cached_at REAL NOT NULL
+        )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_playlist_cache_cached_at ON playlist_cache (cached_at)')
+
+        # Create uploaded playlists table, linked to the Spotify playlist they were uploaded to
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS playlists (
+            id TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            spotify_id TEXT,
+            url TEXT,
+            snapshot_id TEXT,
+            created_at TIMESTAMP NOT NULL,
+            updated_at TIMESTAMP NOT NULL
+        )
+        ''')
+
+        # Resolved tracks of each playlist, in playlist order
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS playlist_tracks (
+            playlist_id TEXT NOT NULL REFERENCES playlists (id) ON DELETE CASCADE,
+            position INTEGER NOT NULL,
+            track_id TEXT NOT NULL,
+            name TEXT,
+            artist TEXT,
+            PRIMARY KEY (playlist_id, position)
+        )
+        ''')
+
+    def _add_missing_columns(self, cursor, table, columns):
+        """Add columns introduced after the table was first created"""
+        cursor.execute(f'PRAGMA table_info({table})')
+        existing = {row['name'] for row in cursor.fetchall()}
+        added = []
+        for name, definition in columns.items():
+            if name not in existing:
+                cursor.execute(f'ALTER TABLE {table} ADD COLUMN {name} {definition}')
+                logger.info(f"Added column {table}.{name}")
+                added.append(name)
+        return added
+
+    def _bump_version(self, conn, key: str = 'catalog_version') -> int:
+        """Next catalog version; call inside a writer transaction"""
+        return conn.execute(
+            "UPDATE meta SET value = (SELECT value FROM meta WHERE key = 'catalog_version') + 1 "
+            "WHERE key IN ('catalog_version', ?) RETURNING value", (key,)
+        ).fetchall()[0][0]
+
+    def get_catalog_version_in(self, conn) -> int:
+        return conn.execute("SELECT value FROM meta WHERE key = 'catalog_version'").fetchone()[0]
+
+    def get_catalog_version(self) -> int:
+        return self.get_catalog_version_in(self._reader())
 
     def add_artist(self, artist_data):
-        cursor = self.conn.cursor()
-        
         # Convert images to JSON string
         images_json = json.dumps(artist_data.get('images', []))
         
-        cursor.execute('''
-        INSERT OR REPLACE INTO artists (id, name, popularity, images, last_updated)
-        VALUES (?, ?, ?, ?, ?)
-        ''', (
-            artist_data['id'],
-            artist_data['name'],
-            artist_data.get('popularity', 0),
-            images_json,
-            datetime.now().isoformat()
-        ))
+        with self._writer() as conn:
+            conn.execute('''
+            INSERT OR REPLACE INTO artists (id, name, popularity, images, thumbnail, version, last_updated)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                artist_data['id'],
+                artist_data['name'],
+                artist_data.get('popularity', 0),
+                images_json,
+                pick_thumbnail(artist_data.get('images', [])),
+                self._bump_version(conn),
+                datetime.now().isoformat()
+            ))
         
-        self.conn.commit()
-        logger.info(f"Added/updated artist: {artist_data['name']} (ID: {artist_data['id']})")
+        logger.debug(f"Added/updated artist: {artist_data['name']} (ID: {artist_data['id']})")
 
     def get_artist(self, artist_id):
-        cursor = self.conn.cursor()
+        cursor = self._reader().cursor()
         cursor.execute('SELECT * FROM artists WHERE id = ?', (artist_id,))
         row = cursor.fetchone()
         
         if row:
-            logger.info(f"Retrieved artist: {row['name']} (ID: {artist_id})")
+            logger.debug(f"Retrieved artist: {row['name']} (ID: {artist_id})")
             return self._row_to_dict(row)
-        logger.info(f"Artist not found: {artist_id}")
+        logger.debug(f"Artist not found: {artist_id}")
         return None
 
-    def get_artists(self, status: Optional[str] = None, page: int = 1, page_size: int = 20) -> dict:
-        cursor = self.conn.cursor()
-        
-        # Get total count
-        if status:
-            cursor.execute('SELECT COUNT(*) FROM artists WHERE status = ?', (status,))
-        else:
-            cursor.execute('SELECT COUNT(*) FROM artists')
-        total_count = cursor.fetchone()[0]
-        
-        # Get paginated and sorted results
-        offset = (page - 1) * page_size
+    def get_artists(self, status: Optional[str] = None, page_size: int = 20,
+                    cursor: Optional[str] = None, include_total: bool = False,
+                    fields: Optional[Iterable[str]] = None) -> dict:
+        """Return one page of artists ordered by popularity.
+
+        Pages are addressed with the opaque `next_cursor` of the previous page
+        (keyset pagination), so every page is an index range scan no matter how
+        deep it is. The total is only counted when `include_total` is set, and
+        is then cached until the next write. `fields` limits the columns that
+        are selected and decoded; by default every field is returned.
+        """
+        fields = select_fields(fields)
+        # Read before the rows, so applying changes since this version never misses a write
+        version = self.get_catalog_version()
+        # The cursor is built from popularity and id, so always select them
+        columns = ', '.join(dict.fromkeys([*fields, 'popularity', 'id']))
+
+        conditions = []
+        params = []
         if status:
-            cursor.execute('''
-                SELECT * FROM artists 
-                WHERE status = ? 
-                ORDER BY popularity DESC 
-                LIMIT ? OFFSET ?
-            ''', (status, page_size, offset))
-        else:
-            cursor.execute('''
-                SELECT * FROM artists 
-                ORDER BY popularity DESC 
-                LIMIT ? OFFSET ?
-            ''', (page_size, offset))
-        
-        rows = cursor.fetchall()
-        artists = [self._row_to_dict(row) for row in rows]
+            conditions.append('status = ?')
+            params.append(status)
+        if cursor:
+            popularity, artist_id = decode_cursor(cursor)
+            conditions.append('(popularity, id) < (?, ?)')
+            params.extend([popularity, artist_id])
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+
+        # Fetch one extra row to learn whether there is a next page
+        rows = self._reader().execute(f'''
+            SELECT {columns} FROM artists
+            {where}
+            ORDER BY popularity DESC, id DESC
+            LIMIT ?
+        ''', (*params, page_size + 1)).fetchall()
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        artists = [self._row_to_dict(row, fields) for row in rows]
         
-        logger.info(f"Retrieved {len(artists)} artists (page {page}, size {page_size}, status: {status or 'all'})")
-        logger.info(f"Total artists in database: {total_count}")
+        logger.debug(f"Retrieved {len(artists)} artists (size {page_size}, status: {status or 'all'})")
         
-        return {
+        result = {
             'artists': artists,
-            'total': total_count,
-            'page': page,
             'page_size': page_size,
-            'has_more': offset + len(artists) < total_count
+            'has_more': has_more,
+            'next_cursor': encode_cursor(rows[-1]['popularity'], rows[-1]['id']) if has_more else None,
+            'version': version
+        }
+        if include_total:
+            result['total'] = self.count_artists(status)
+        return result
+
+    def count_artists(self, status: Optional[str] = None) -> int:
+        total = self._count_cache.get(status)
+        if total is MISSING:
+            if status:
+                row = self._reader().execute('SELECT COUNT(*) FROM artists WHERE status = ?', (status,)).fetchone()
+            else:
+                row = self._reader().execute('SELECT COUNT(*) FROM artists').fetchone()
+            total = row[0]
+            self._count_cache.set(status, total)
+        return total
+
+    def get_artist_features(self, status: Optional[str] = None) -> List[dict]:
+        """Every artist, or every artist with a status, with the fields used for ranking"""
+        query = 'SELECT id, name, popularity, status, thumbnail, genres, related FROM artists'
+        params = ()
+        if status:
+            query += ' WHERE status = ?'
+            params = (status,)
+        rows = self._reader().execute(query, params).fetchall()
+        return [self._row_to_dict(row) for row in rows]
+
+    def find_artist_by_name(self, name: str) -> Optional[dict]:
+        row = self._reader().execute(
+            'SELECT * FROM artists WHERE name = ? COLLATE NOCASE ORDER BY popularity DESC LIMIT 1', (name.strip(),)
+        ).fetchone()
+        return self._row_to_dict(row)
+
+    def get_artist_ids(self, status: str) -> List[str]:
+        rows = self._reader().execute('SELECT id FROM artists WHERE status = ?', (status,)).fetchall()
+        return [row['id'] for row in rows]
+
+    def get_changes_since(self, version: int, fields: Optional[Iterable[str]] = None) -> dict:
+        """Artists written after `version`, oldest first.
+
+        `reset` is set when artists were deleted since then, or when
+        `version` is ahead of the catalog (e.g. the database was recreated);
+        the client must then reload the full list instead of applying the
+        delta.
+        """
+        fields = select_fields(fields)
+        conn = self._reader()
+        # One read transaction, so the version matches the rows
+        conn.execute('BEGIN')
+        try:
+            meta = dict(conn.execute('SELECT key, value FROM meta').fetchall())
+            rows = conn.execute(
+                f'SELECT {", ".join(fields)} FROM artists WHERE version > ? ORDER BY version',
+                (version,)
+            ).fetchall() if version < meta['catalog_version'] else []
+        finally:
+            conn.execute('COMMIT')
+        return {
+            'version': meta['catalog_version'],
+            'reset': version < meta['reset_version'] or version > meta['catalog_version'],
+            'artists': [self._row_to_dict(row, fields) for row in rows]
         }
 
     def update_artist_status(self, artist_id, status):
-        cursor = self.conn.cursor()
-        cursor.execute('''
-        UPDATE artists 
-        SET status = ?, last_updated = ?
-        WHERE id = ?
-        ''', (status, datetime.now().isoformat(), artist_id))
-        
-        self.conn.commit()
-        logger.info(f"Updated artist status: {artist_id} -> {status}")
+        return self.update_artist_statuses({artist_id: status})['version']
+
+    def update_artist_statuses(self, changes: Dict[str, str], fields: Optional[Iterable[str]] = None) -> dict:
+        """Apply many status changes in one transaction.
+
+        Returns the new catalog version and only the artists whose status
+        actually changed; unknown IDs and unchanged statuses are skipped.
+        """
+        invalid = {status for status in changes.values() if status not in ARTIST_STATUSES}
+        if invalid:
+            raise ValueError(f"Invalid status(es): {', '.join(sorted(invalid))}")
+        fields = select_fields(fields)
+        now = datetime.now().isoformat()
+        changed = []
+        with self._writer() as conn:
+            # The writer lock is held, so this is the version the writes below will get
+            version = self.get_catalog_version_in(conn) + 1
+            for artist_id, status in changes.items():
+                row = conn.execute(f'''
+                UPDATE artists
+                SET status = ?, version = ?, last_updated = ?
+                WHERE id = ? AND status IS NOT ?
+                RETURNING {", ".join(fields)}
+                ''', (status, version, now, artist_id, status)).fetchone()
+                if row is not None:
+                    changed.append(self._row_to_dict(row, fields))
+            if changed:
+                self._bump_version(conn)
+            else:
+                version -= 1
+
+        logger.debug(f"Updated {len(changed)} of {len(changes)} artist statuses (version {version})")
+        return {'version': version, 'artists': changed}
 
     def update_artist(self, artist_id: str, artist_data: dict):
         """Update an existing artist's data while preserving their status"""
         try:
-            with self.conn.connect() as conn:
-                conn.execute(
-                    text("""
-                        UPDATE artists 
-                        SET name = :name,
-                            popularity = :popularity,
-                            images = :images,
-                            last_updated = CURRENT_TIMESTAMP
-                        WHERE id = :id
-                    """),
-                    {
-                        'id': artist_id,
-                        'name': artist_data['name'],
-                        'popularity': artist_data['popularity'],
-                        'images': json.dumps(artist_data['images'])
-                    }
-                )
-                conn.commit()
+            with self._writer() as conn:
+                conn.execute('''
+                UPDATE artists
+                SET name = ?, popularity = ?, images = ?, thumbnail = ?, version = ?, last_updated = ?
+                WHERE id = ?
+                ''', (
+                    artist_data['name'],
+                    artist_data.get('popularity', 0),
+                    json.dumps(artist_data.get('images', [])),
+                    pick_thumbnail(artist_data.get('images', [])),
+                    self._bump_version(conn),
+                    datetime.now().isoformat(),
+                    artist_id
+                ))
         except Exception as e:
             logger.error(f"Error updating artist {artist_id}: {str(e)}")
             raise
 
-    def _row_to_dict(self, row):
+    def upsert_artists(self, artists: Iterable[dict]) -> dict:
+        """Insert new artists and refresh existing ones in a single transaction.
+
+        Existing artists keep their status; they are only written when their
+        name, popularity, images, time ranges, genres or related artists
+        changed. Related artists are kept as they are when an artist comes
+        without a `related` key. Returns inserted/updated/unchanged counts.
+        """
+        incoming = {}
+        for artist in artists:
+            incoming[artist['id']] = (
+                artist['name'],
+                artist.get('popularity', 0),
+                json.dumps(artist.get('images', [])),
+                json.dumps(artist.get('time_ranges', [])),
+                pick_thumbnail(artist.get('images', [])),
+                json.dumps(artist.get('genres', [])),
+                json.dumps(artist['related']) if 'related' in artist else None
+            )
+
+        now = datetime.now().isoformat()
+        inserts = []
+        updates = []
+        with self._writer() as conn:
+            # Compare against current rows inside the transaction so a
+            # concurrent writer can't slip in between the read and the write
+            cursor = conn.cursor()
+            existing = {}
+            ids = list(incoming)
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                placeholders = ','.join('?' * len(chunk))
+                cursor.execute(
+                    f'SELECT id, name, popularity, images, time_ranges, thumbnail, genres, related FROM artists WHERE id IN ({placeholders})',
+                    chunk
+                )
+                for row in cursor.fetchall():
+                    existing[row['id']] = tuple(row)[1:]
+
+            version = self.get_catalog_version_in(conn) + 1
+            for artist_id, values in incoming.items():
+                if artist_id not in existing:
+                    inserts.append((artist_id, *values, version, now))
+                    continue
+                if values[-1] is None:
+                    values = (*values[:-1], existing[artist_id][-1])
+                if existing[artist_id] != values:
+                    updates.append((*values, version, now, artist_id))
+
+            cursor.executemany('''
+            INSERT INTO artists (id, name, popularity, images, time_ranges, thumbnail, genres, related, version,
+                                 last_updated)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', inserts)
+            cursor.executemany('''
+            UPDATE artists
+            SET name = ?, popularity = ?, images = ?, time_ranges = ?, thumbnail = ?, genres = ?, related = ?,
+                version = ?, last_updated = ?
+            WHERE id = ?
+            ''', updates)
+            if inserts or updates:
+                self._bump_version(conn)
+
+        counts = {
+            'inserted': len(inserts),
+            'updated': len(updates),
+            'unchanged': len(incoming) - len(inserts) - len(updates)
+        }
+        logger.info(f"Upserted {len(incoming)} artists: {counts}")
+        return counts
+
+    def get_cached_tracks(self, track_keys):
+        """Return (track_key, track_id, cached_at) rows for the given keys"""
+        cursor = self._reader().cursor()
+        rows = []
+        track_keys = list(track_keys)
+        for start in range(0, len(track_keys), 500):
+            chunk = track_keys[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            cursor.execute(
+                f'SELECT track_key, track_id, cached_at FROM track_cache WHERE track_key IN ({placeholders})',
+                chunk
+            )
+            rows.extend((row['track_key'], row['track_id'], row['cached_at']) for row in cursor.fetchall())
+        return rows
+
+    def cache_tracks(self, entries: dict, cached_at: float):
+        """Store track_key -> track_id (or None) entries in a single transaction"""
+        with self._writer() as conn:
+            conn.executemany('''
+            INSERT OR REPLACE INTO track_cache (track_key, track_id, cached_at)
+            VALUES (?, ?, ?)
+            ''', [(key, track_id, cached_at) for key, track_id in entries.items()])
+        logger.debug(f"Cached {len(entries)} track lookups")
+
+    def purge_cached_tracks(self, found_before: float, not_found_before: float, max_rows: int) -> int:
+        """Delete expired track lookups, then the oldest ones beyond `max_rows`"""
+        with self._writer() as conn:
+            deleted = conn.execute('''
+            DELETE FROM track_cache
+            WHERE (track_id IS NOT NULL AND cached_at < ?) OR (track_id IS NULL AND cached_at < ?)
+            ''', (found_before, not_found_before)).rowcount
+            deleted += conn.execute('''
+            DELETE FROM track_cache WHERE track_key IN (
+                SELECT track_key FROM track_cache ORDER BY cached_at DESC LIMIT -1 OFFSET ?
+            )
+            ''', (max_rows,)).rowcount
+        if deleted:
+            logger.info(f"Purged {deleted} track cache rows")
+        return deleted
+
+    def get_cached_playlist(self, cache_key: str):
+        """Return (response JSON, cached_at) for a cached playlist, or None"""
+        row = self._reader().execute(
+            'SELECT response, cached_at FROM playlist_cache WHERE cache_key = ?', (cache_key,)
+        ).fetchone()
+        return (row['response'], row['cached_at']) if row else None
+
+    def cache_playlist(self, cache_key: str, response: str, cached_at: float):
+        with self._writer() as conn:
+            conn.execute('''
+            INSERT OR REPLACE INTO playlist_cache (cache_key, response, cached_at)
+            VALUES (?, ?, ?)
+            ''', (cache_key, response, cached_at))
+
+    def save_playlist(self, playlist_id: str, name: str, tracks: List[dict],
+                      spotify_id: Optional[str] = None, url: Optional[str] = None,
+                      snapshot_id: Optional[str] = None) -> dict:
+        """Create or replace a playlist and its tracks ({track_id, name, artist}) in one transaction"""
+        now = datetime.now().isoformat()
+        with self._writer() as conn:
+            conn.execute('''
+            INSERT INTO playlists (id, name, spotify_id, url, snapshot_id, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (id) DO UPDATE SET
+                name = excluded.name,
+                spotify_id = excluded.spotify_id,
+                url = excluded.url,
+                snapshot_id = excluded.snapshot_id,
+                updated_at = excluded.updated_at
+            ''', (playlist_id, name, spotify_id, url, snapshot_id, now, now))
+            conn.execute('DELETE FROM playlist_tracks WHERE playlist_id = ?', (playlist_id,))
+            conn.executemany('''
+            INSERT INTO playlist_tracks (playlist_id, position, track_id, name, artist)
+            VALUES (?, ?, ?, ?, ?)
+            ''', [
+                (playlist_id, position, track['track_id'], track.get('name'), track.get('artist'))
+                for position, track in enumerate(tracks)
+            ])
+        logger.debug(f"Saved playlist {playlist_id} with {len(tracks)} tracks")
+        return self.get_playlist(playlist_id)
+
+    def get_playlist(self, playlist_id: str) -> Optional[dict]:
+        """A playlist with its tracks in order, or None"""
+        conn = self._reader()
+        conn.execute('BEGIN')
+        try:
+            row = conn.execute('SELECT * FROM playlists WHERE id = ?', (playlist_id,)).fetchone()
+            if not row:
+                return None
+            tracks = conn.execute(
+                'SELECT track_id, name, artist FROM playlist_tracks WHERE playlist_id = ? ORDER BY position',
+                (playlist_id,)
+            ).fetchall()
+        finally:
+            conn.execute('COMMIT')
+        return {**dict(row), 'tracks': [dict(track) for track in tracks]}
+
+    def get_playlists(self) -> List[dict]:
+        """All playlists, most recently updated first, with their track counts"""
+        rows = self._reader().execute('''
+        SELECT playlists.*, COUNT(playlist_tracks.position) AS track_count
+        FROM playlists LEFT JOIN playlist_tracks ON playlist_tracks.playlist_id = playlists.id
+        GROUP BY playlists.id
+        ORDER BY playlists.updated_at DESC
+        ''').fetchall()
+        return [dict(row) for row in rows]
+
+    def purge_cached_playlists(self, expired_before: float, max_rows: int) -> int:
+        """Delete expired playlists, then the oldest ones beyond `max_rows`"""
+        with self._writer() as conn:
+            deleted = conn.execute(
+                'DELETE FROM playlist_cache WHERE cached_at < ?', (expired_before,)
+            ).rowcount
+            deleted += conn.execute('''
+            DELETE FROM playlist_cache WHERE cache_key IN (
+                SELECT cache_key FROM playlist_cache ORDER BY cached_at DESC LIMIT -1 OFFSET ?
+            )
+            ''', (max_rows,)).rowcount
+        if deleted:
+            logger.info(f"Purged {deleted} playlist cache rows")
+        return deleted
+
+    def create_job(self, job_id: str, kind: str, params: dict, owner: Optional[str] = None) -> dict:
+        now = datetime.now().isoformat()
+        with self._writer() as conn:
+            conn.execute('''
+            INSERT INTO jobs (id, kind, status, params, owner, heartbeat_at, created_at, updated_at)
+            VALUES (?, ?, 'queued', ?, ?, ?, ?, ?)
+            ''', (job_id, kind, json.dumps(params), owner, time.time(), now, now))
+        return self.get_job(job_id)
+
+    def claim_job(self, job_id: str, owner: str) -> bool:
+        """Move a queued job of `owner` to running; False if it is no longer queued"""
+        with self._writer() as conn:
+            return conn.execute('''
+            UPDATE jobs SET status = 'running', heartbeat_at = ?, updated_at = ?
+            WHERE id = ? AND owner = ? AND status = 'queued'
+            ''', (time.time(), datetime.now().isoformat(), job_id, owner)).rowcount == 1
+
+    def update_job(self, job_id: str, owner: str, **fields) -> bool:
+        """Update status, progress, total, message, result or error of a running job.
+
+        Only the owner of a job that is still running can update it, so a job
+        failed by another worker can't be flipped back. Returns False if
+        nothing was updated.
+        """
+        if 'result' in fields:
+            fields['result'] = json.dumps(fields['result'])
+        fields['updated_at'] = datetime.now().isoformat()
+        assignments = ', '.join(f'{name} = ?' for name in fields)
+        with self._writer() as conn:
+            return conn.execute(
+                f"UPDATE jobs SET {assignments} WHERE id = ? AND owner = ? AND status = 'running'",
+                (*fields.values(), job_id, owner)
+            ).rowcount == 1
+
+    def get_job(self, job_id: str) -> Optional[dict]:
+        row = self._reader().execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        if not row:
+            return None
+        job = dict(row)
+        job['params'] = json.loads(job['params'] or 'null')
+        job['result'] = json.loads(job['result'] or 'null')
+        return job
+
+    def heartbeat_jobs(self, owner: str) -> int:
+        """Extend the lease on every unfinished job of `owner`"""
+        with self._writer() as conn:
+            return conn.execute('''
+            UPDATE jobs SET heartbeat_at = ?
+            WHERE owner = ? AND status IN ('queued', 'running')
+            ''', (time.time(), owner)).rowcount
+
+    def fail_job(self, job_id: str, owner: str, error: str) -> bool:
+        """Fail a queued or running job of `owner`; False if it already finished"""
+        with self._writer() as conn:
+            return conn.execute('''
+            UPDATE jobs SET status = 'failed', error = ?, updated_at = ?
+            WHERE id = ? AND owner = ? AND status IN ('queued', 'running')
+            ''', (error, datetime.now().isoformat(), job_id, owner)).rowcount == 1
+
+    def fail_unfinished_jobs(self, error: str, expired_before: float) -> int:
+        """Fail queued and running jobs whose owner stopped heartbeating before `expired_before`"""
+        with self._writer() as conn:
+            cursor = conn.execute('''
+            UPDATE jobs SET status = 'failed', error = ?, updated_at = ?
+            WHERE status IN ('queued', 'running') AND (heartbeat_at IS NULL OR heartbeat_at < ?)
+            ''', (error, datetime.now().isoformat(), expired_before))
+            return cursor.rowcount
+
+    def _row_to_dict(self, row, fields=None):
         if not row:
             return None
             
         artist_dict = dict(row)
+        if fields is not None:
+            artist_dict = {field: artist_dict[field] for field in fields}
         
         # Parse images JSON string back to list
-        if artist_dict.get('images'):
-            artist_dict['images'] = json.loads(artist_dict['images'])
-        else:
-            artist_dict['images'] = []
+        if 'images' in artist_dict:
+            artist_dict['images'] = json.loads(artist_dict['images'] or '[]')
+
+        for field in JSON_FIELDS:
+            if field in artist_dict:
+                artist_dict[field] = json.loads(artist_dict[field] or '[]')
             
         return artist_dict
 
-    def __del__(self):
-        self.conn.close()
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._executor.shutdown(wait=True)
+        with self._readers_lock:
+            for conn in self._readers:
+                conn.close()
+            self._readers.clear()
+        self._write_conn.close()
         logger.info("Database connection closed")
 
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
     def clear_artists(self):
-        cursor = self.conn.cursor()
-        cursor.execute('DELETE FROM artists')
-        self.conn.commit()
+        with self._writer() as conn:
+            conn.execute('DELETE FROM artists')
+            self._bump_version(conn, 'reset_version')
         logger.info("Cleared all artists from database") 
\ No newline at end of file
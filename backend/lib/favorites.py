@@ -0,0 +1,99 @@
+import os
+import re
+import math
+import logging
+from collections import Counter
+from typing import List, Optional
+
+from .track_cache import normalize
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on the prompt tokens spent on favorite artist names
+FAVORITES_TOKEN_BUDGET = int(os.getenv('FAVORITES_TOKEN_BUDGET', '200'))
+FAVORITES_MAX_ARTISTS = int(os.getenv('FAVORITES_MAX_ARTISTS', '40'))
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Artist name matches count more than genre matches
+NAME_WEIGHT = 2
+
+_WORD_RE = re.compile(r'\w+')
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count, about four characters per token"""
+    return max(1, math.ceil(len(text) / 4))
+
+
+def _terms(text: str) -> List[str]:
+    return _WORD_RE.findall(normalize(text))
+
+
+class FavoritesSelector:
+    """Picks the liked artists most relevant to a playlist request.
+
+    Each liked artist is indexed by the words of its name and genres, and
+    ranked against the request with BM25; artists the request says nothing
+    about are ranked by popularity. Names are taken in that order until the
+    token budget or the artist limit is reached, so the prompt stays bounded
+    however many artists are liked.
+    """
+
+    def __init__(self, db, token_budget: int = FAVORITES_TOKEN_BUDGET,
+                 max_artists: int = FAVORITES_MAX_ARTISTS):
+        self.db = db
+        self.token_budget = token_budget
+        self.max_artists = max_artists
+
+    def rank(self, request: str, artists: List[dict]) -> List[dict]:
+        documents = []
+        for artist in artists:
+            terms = Counter()
+            for term in _terms(artist['name']):
+                terms[term] += NAME_WEIGHT
+            for genre in artist.get('genres') or []:
+                terms.update(_terms(genre))
+            documents.append(terms)
+
+        query = set(_terms(request))
+        document_frequency = Counter(term for terms in documents for term in query & terms.keys())
+        lengths = [sum(terms.values()) for terms in documents]
+        average_length = sum(lengths) / len(lengths) if lengths else 0
+
+        def score(position: int) -> float:
+            terms = documents[position]
+            total = 0.0
+            for term in query & terms.keys():
+                idf = math.log(1 + (len(documents) - document_frequency[term] + 0.5) / (document_frequency[term] + 0.5))
+                frequency = terms[term]
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[position] / average_length)
+                total += idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+            return total
+
+        order = sorted(
+            range(len(artists)),
+            key=lambda position: (score(position), artists[position]['popularity']),
+            reverse=True
+        )
+        return [artists[position] for position in order]
+
+    def load(self) -> List[dict]:
+        """The liked artists, to rank several requests against one read"""
+        return self.db.get_artist_features(status='like')
+
+    def select(self, request: str, liked: Optional[List[dict]] = None) -> List[str]:
+        """Names of the most relevant liked artists that fit the token budget"""
+        if liked is None:
+            liked = self.load()
+        names = []
+        tokens = 0
+        for artist in self.rank(request, liked):
+            # Names are joined with ", " in the prompt
+            cost = estimate_tokens(artist['name']) + 1
+            if len(names) >= self.max_artists or tokens + cost > self.token_budget:
+                break
+            names.append(artist['name'])
+            tokens += cost
+        logger.debug(f"Selected {len(names)} of {len(liked)} liked artists ({tokens} tokens)")
+        return names
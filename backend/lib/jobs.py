@@ -0,0 +1,147 @@
+import os
+import time
+import uuid
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '2'))
+# Minimum seconds between progress writes for a single job
+PROGRESS_INTERVAL = 0.5
+# Unfinished jobs whose owner hasn't heartbeated for this long are failed by any other worker
+JOB_LEASE_SECONDS = float(os.getenv('JOB_LEASE_SECONDS', '30'))
+INTERRUPTED_ERROR = "Interrupted: the server running it stopped"
+
+
+class JobLostError(Exception):
+    """The job was failed by another worker after its lease expired"""
+
+# A handler receives the job params and an async progress(done, total, message) callback
+JobHandler = Callable[[dict, Callable[..., Awaitable[None]]], Awaitable[dict]]
+
+
+class JobManager:
+    """In-process background jobs with their state persisted in SQLite.
+
+    Submitted jobs are queued and run by a fixed pool of worker tasks, so
+    long syncs and uploads no longer run inside the HTTP request. Any
+    worker process can report a job's progress because state lives in the
+    `jobs` table. Each manager owns the jobs it submits and renews a lease
+    on them; any manager fails queued or running jobs whose lease expired,
+    so jobs of a stopped process fail while those of live workers are left
+    alone.
+    """
+
+    def __init__(self, db, max_workers: int = JOB_WORKERS, lease_seconds: float = JOB_LEASE_SECONDS):
+        self.db = db
+        self.max_workers = max_workers
+        self.lease_seconds = lease_seconds
+        # Unique per process start
+        self.owner = uuid.uuid4().hex
+        self._handlers: Dict[str, JobHandler] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers = []
+        self._starting: Optional[asyncio.Future] = None
+
+    def register(self, kind: str, handler: JobHandler):
+        self._handlers[kind] = handler
+
+    async def start(self):
+        """Fail interrupted jobs and start the workers; runs once, concurrent callers wait for it"""
+        if self._starting is None:
+            self._starting = asyncio.ensure_future(self._start())
+        try:
+            await asyncio.shield(self._starting)
+        except Exception:
+            self._starting = None
+            raise
+
+    async def _start(self):
+        await self._fail_expired()
+        self._queue = asyncio.Queue()
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.max_workers)]
+        self._workers.append(asyncio.create_task(self._heartbeat()))
+
+    async def _fail_expired(self):
+        interrupted = await self.db.run(
+            self.db.fail_unfinished_jobs, INTERRUPTED_ERROR, time.time() - self.lease_seconds
+        )
+        if interrupted:
+            logger.warning(f"Marked {interrupted} interrupted jobs as failed")
+
+    async def _heartbeat(self):
+        """Renew the lease on our jobs and fail jobs of managers that stopped renewing theirs"""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                await self.db.run(self.db.heartbeat_jobs, self.owner)
+                await self._fail_expired()
+            except Exception as e:
+                logger.error(f"Job heartbeat failed: {str(e)}")
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._starting = None
+
+    async def submit(self, kind: str, params: dict) -> dict:
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        await self.start()
+        job_id = uuid.uuid4().hex
+        job = await self.db.run(self.db.create_job, job_id, kind, params, owner=self.owner)
+        await self._queue.put(job_id)
+        logger.info(f"Queued {kind} job {job_id}")
+        return job
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        return await self.db.run(self.db.get_job, job_id)
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except Exception as e:
+                # e.g. the database stayed locked; the worker must survive to run the next jobs
+                logger.error(f"Job {job_id} could not be run: {str(e)}", exc_info=True)
+                try:
+                    await self.db.run(self.db.fail_job, job_id, self.owner, str(e))
+                except Exception as e:
+                    logger.error(f"Could not mark job {job_id} as failed: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str):
+        job = await self.db.run(self.db.get_job, job_id)
+        if not await self.db.run(self.db.claim_job, job_id, self.owner):
+            logger.warning(f"Job {job_id} is no longer queued, skipping it")
+            return
+        last_write = 0.0
+
+        async def progress(done: int, total: int, message: Optional[str] = None):
+            nonlocal last_write
+            now = time.monotonic()
+            if done < total and now - last_write < PROGRESS_INTERVAL:
+                return
+            last_write = now
+            if not await self.db.run(
+                self.db.update_job, job_id, self.owner, progress=done, total=total, message=message
+            ):
+                raise JobLostError(f"Job {job_id} was failed by another worker")
+
+        try:
+            result = await self._handlers[job['kind']](job['params'], progress)
+            if await self.db.run(self.db.update_job, job_id, self.owner, status='completed', result=result):
+                logger.info(f"Job {job_id} completed")
+            else:
+                logger.warning(f"Job {job_id} was failed by another worker, discarding its result")
+        except JobLostError as e:
+            logger.warning(str(e))
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {str(e)}", exc_info=True)
+            await self.db.run(self.db.update_job, job_id, self.owner, status='failed', error=str(e))
@@ -0,0 +1,153 @@
+import os
+import sys
+import json
+import queue
+import atexit
+import random
+import logging
+import logging.handlers
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+# Per-logger levels, e.g. "lib.database=WARNING,httpx=WARNING"
+LOG_LEVELS = os.getenv('LOG_LEVELS', 'httpx=WARNING,urllib3=WARNING')
+# Fraction of INFO and DEBUG records kept per logger, e.g. "lib.singleflight=0.1"
+LOG_SAMPLE_RATES = os.getenv('LOG_SAMPLE_RATES', '')
+# "json" for one JSON object per line, "text" for the classic format
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'json')
+# Longer messages are cut to this many characters
+LOG_MAX_LENGTH = int(os.getenv('LOG_MAX_LENGTH', '2000'))
+# Optional log file, written by the listener thread
+LOG_FILE = os.getenv('LOG_FILE')
+
+# Attributes every LogRecord has; anything else was passed through `extra`
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def _parse_mapping(value: str) -> Dict[str, str]:
+    mapping = {}
+    for item in value.split(','):
+        name, _, setting = item.partition('=')
+        if name.strip() and setting.strip():
+            mapping[name.strip()] = setting.strip()
+    return mapping
+
+
+class SamplingFilter(logging.Filter):
+    """Keep a fraction of INFO and DEBUG records.
+
+    The rate comes from `extra={'sample_rate': ...}` on the record, else from
+    the closest configured logger name. Warnings and errors are always kept.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+
+    def _rate(self, record: logging.LogRecord) -> float:
+        rate = getattr(record, 'sample_rate', None)
+        if rate is not None:
+            return rate
+        name = record.name
+        while name:
+            if name in self.rates:
+                return self.rates[name]
+            name = name.rpartition('.')[0]
+        return 1.0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.INFO:
+            return True
+        rate = self._rate(record)
+        return rate >= 1.0 or random.random() < rate
+
+
+class TruncatingFilter(logging.Filter):
+    """Format the message once and cut it to `max_length` characters"""
+
+    def __init__(self, max_length: int):
+        super().__init__()
+        self.max_length = max_length
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        message = record.getMessage()
+        if len(message) > self.max_length:
+            message = f"{message[:self.max_length]}... [{len(message) - self.max_length} chars truncated]"
+        record.msg = message
+        record.args = None
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, including any `extra` fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and key != 'sample_rate':
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def setup_logging():
+    """Route all logging through a queue drained by a background thread.
+
+    Callers only format and enqueue records; the stream and file writes
+    happen on the listener thread. Safe to call more than once.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    if LOG_FORMAT == 'json':
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    handlers = [logging.StreamHandler(sys.stderr)]
+    if LOG_FILE:
+        handlers.append(logging.FileHandler(LOG_FILE))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter({
+        name: float(rate) for name, rate in _parse_mapping(LOG_SAMPLE_RATES).items()
+    }))
+    queue_handler.addFilter(TruncatingFilter(LOG_MAX_LENGTH))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    # uvicorn installs its own synchronous handlers; send its records through the queue too
+    for name in ('uvicorn', 'uvicorn.error', 'uvicorn.access'):
+        uvicorn_logger = logging.getLogger(name)
+        for handler in list(uvicorn_logger.handlers):
+            uvicorn_logger.removeHandler(handler)
+        uvicorn_logger.propagate = True
+    root.setLevel(LOG_LEVEL.upper())
+    for name, level in _parse_mapping(LOG_LEVELS).items():
+        logging.getLogger(name).setLevel(level.upper())
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """Flush queued records and stop the listener thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
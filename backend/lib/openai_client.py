@@ -1,124 +1,328 @@
 import os
-import openai
+import time
 import logging
-from typing import List, Dict
+from typing import AsyncIterator, Dict, List, Tuple
 from pydantic import BaseModel, Field
+from .metrics import OPENAI_REQUEST_DURATION, OPENAI_TOKENS, PLAYLIST_GENERATE_DURATION
+from .playlist_cache import playlist_cache_key
+from .playlist_stream import PlaylistStreamParser
+from .singleflight import SingleFlight
+from .track_cache import track_key
 
 # Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('openai.log'),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
 
-logger.info(f"openi version: {openai.version.VERSION}") 
+
+OPENAI_MAX_CONNECTIONS = int(os.getenv('OPENAI_MAX_CONNECTIONS', '20'))
 
 class Track(BaseModel):
     name: str = Field(..., description="The name of the track")
     artist: str = Field(..., description="The name of the artist")
 
-class PlaylistResponse(BaseModel):
-    name: str = Field(..., description="A short, catchy name for the playlist")
-    tracks: List[Track] = Field(..., min_items=1, max_items=50)
-
 class OpenAIClient:
-    def __init__(self):
+    MODEL = "gpt-3.5-turbo"
+    TEMPERATURE = 0.7
+    MAX_TOKENS = 2000
+    # Follow-up completions asking only for missing tracks
+    MAX_TOP_UP_ATTEMPTS = 2
+    TOP_UP_TOKENS_PER_TRACK = 40
+
+    def __init__(self, cache=None, max_connections: int = OPENAI_MAX_CONNECTIONS):
         logger.info("Initializing OpenAI client")
-        self.client = openai.OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
-        logger.info("OpenAI client initialized")
+        # openai and httpx load here rather than at import, so the app starts without them
+        import httpx
+        import openai
+
+        # One shared keep-alive pool for all requests
+        self.client = openai.AsyncOpenAI(
+            api_key=os.getenv('OPENAI_API_KEY'),
+            http_client=openai.DefaultAsyncHttpxClient(
+                limits=httpx.Limits(
+                    max_connections=max_connections,
+                    max_keepalive_connections=max_connections
+                )
+            )
+        )
+        self.cache = cache
+        self.inflight = SingleFlight()
+        logger.info(f"OpenAI client initialized (openai {openai.version.VERSION})")
+
+    async def close(self):
+        await self.client.close()
+
+    def model_params(self) -> dict:
+        return {
+            "model": self.MODEL,
+            "temperature": self.TEMPERATURE,
+            "max_tokens": self.MAX_TOKENS
+        }
+
+    async def generate_playlist(self, request: str, track_count: int = 10, liked_artists_names: list[str] = None,
+                                use_cache: bool = True) -> Dict[str, any]:
+        """Generate a playlist based on the user's request.
+
+        Identical requests (same text, track count, model parameters and
+        favorites) are answered from the cache when `use_cache` is set, and
+        identical requests that are already in flight share one API call.
+        """
+        start = time.perf_counter()
+        source = "openai"
+        try:
+            if not use_cache:
+                return await self._generate_playlist(request, track_count, liked_artists_names)
+
+            cache_key = playlist_cache_key(request, track_count, self.model_params(), liked_artists_names)
+            if self.cache is not None:
+                cached = await self.cache.aget(cache_key)
+                if cached is not None:
+                    logger.info(f"Playlist cache hit for request: {request}")
+                    source = "cache"
+                    return cached
+
+            async def generate_and_cache():
+                playlist = await self._generate_playlist(request, track_count, liked_artists_names)
+                # Partial playlists are not cached so the next request can do better
+                if self.cache is not None and len(playlist["tracks"]) == track_count:
+                    await self.cache.aset(cache_key, playlist)
+                return playlist
+
+            return await self.inflight.do(cache_key, generate_and_cache)
+        finally:
+            PLAYLIST_GENERATE_DURATION.observe(time.perf_counter() - start, source=source)
+
+    def _record_usage(self, response):
+        usage = getattr(response, "usage", None)
+        if usage is None:
+            return
+        OPENAI_TOKENS.inc(usage.prompt_tokens, model=self.MODEL, kind="prompt")
+        OPENAI_TOKENS.inc(usage.completion_tokens, model=self.MODEL, kind="completion")
+
+    async def stream_playlist(self, request: str, track_count: int = 10, liked_artists_names: list[str] = None,
+                              use_cache: bool = True) -> AsyncIterator[Tuple[str, object]]:
+        """Generate a playlist, yielding events as the completion streams in.
+
+        Yields ("name", str) and ("track", dict) as soon as each is complete,
+        including tracks added by the top-up step, then ("done", playlist), or
+        ("error", message) if no valid track could be produced.
+        """
+        cache_key = None
+        if self.cache is not None and use_cache:
+            cache_key = playlist_cache_key(request, track_count, self.model_params(), liked_artists_names)
+            cached = await self.cache.aget(cache_key)
+            if cached is not None:
+                logger.info(f"Playlist cache hit for request: {request}")
+                yield "name", cached["name"]
+                for track in cached["tracks"]:
+                    yield "track", track
+                yield "done", cached
+                return
+
+        try:
+            logger.info(f"Streaming playlist for request: {request} with {track_count} tracks")
+            parser = PlaylistStreamParser()
+            name = None
+            tracks = []
+            seen = set()
+            with OPENAI_REQUEST_DURATION.time("openai", operation="stream"):
+                stream = await self.client.chat.completions.create(
+                    model=self.MODEL,
+                    messages=self._build_messages(request, track_count, liked_artists_names),
+                    temperature=self.TEMPERATURE,
+                    max_tokens=self.MAX_TOKENS,
+                    response_format={"type": "json_object"},
+                    stream=True
+                )
+                async for chunk in stream:
+                    if not chunk.choices:
+                        continue
+                    for event, data in parser.feed(chunk.choices[0].delta.content or ""):
+                        if event == "name":
+                            name = data
+                            yield event, data
+                        else:
+                            for track in self._add_tracks([data], tracks, seen, track_count):
+                                yield "track", track
+
+            logger.debug("Received streamed response from OpenAI API")
+            async for track in self._top_up(request, track_count, tracks, seen, liked_artists_names):
+                yield "track", track
+            playlist = self._finish_playlist(name, tracks, request, track_count)
+        except Exception as e:
+            logger.error(f"Error streaming playlist: {str(e)}", exc_info=True)
+            yield "error", str(e)
+            return
+
+        if cache_key is not None and len(playlist["tracks"]) == track_count:
+            await self.cache.aset(cache_key, playlist)
+        yield "done", playlist
+
+    def _build_messages(self, request: str, track_count: int, liked_artists_names: list[str] = None) -> List[dict]:
+        if liked_artists_names is not None:
+            liked_artists_message = f"Consider the following artists as favorites: {', '.join(liked_artists_names)}"
+        else:
+            liked_artists_message = ""
 
-    def generate_playlist(self, request: str, track_count: int = 10, liked_artists_names: list[str] = None) -> Dict[str, any]:
-        """Generate a playlist based on the user's request"""
+        return [
+                {
+                    "role": "system",
+                    "content": f"""You are a music expert that generates playlists based on user requests.
+                    You must return a valid JSON object with a playlist name and exactly {track_count} tracks.
+                    The playlist name should be short, catchy, and reflect the theme of the playlist.
+                    Each track must have a name and artist.
+                    Make sure the tracks are diverse and match the user's request.
+
+                    If favourite artists are provided consider them in the playlist, but only if they are relevant to the request.
+                    
+                    Important: Ensure the response is a complete, valid JSON object.
+                    The response must match this exact schema:
+                    {{
+                        "name": "string (max 50 chars)",
+                        "tracks": [
+                            {{
+                                "name": "string",
+                                "artist": "string"
+                            }}
+                        ]
+                    }}"""
+                },
+                {
+                    "role": "user",
+                    "content": f"""
+                    Generate a playlist of exactly {track_count} tracks based on this request: {request}. 
+                    {liked_artists_message}"""
+                }
+            ]
+
+    def _build_top_up_messages(self, request: str, missing: int, tracks: List[dict],
+                               liked_artists_names: list[str] = None) -> List[dict]:
+        chosen = "\n".join(f"- {track['name']} by {track['artist']}" for track in tracks)
+        favorites = ""
+        if liked_artists_names is not None:
+            favorites = f"\nConsider the following artists as favorites: {', '.join(liked_artists_names)}"
+        return [
+            {
+                "role": "system",
+                "content": (
+                    "You are a music expert completing a playlist. "
+                    f'Return a valid JSON object {{"tracks": [{{"name": "string", "artist": "string"}}]}} '
+                    f"with exactly {missing} tracks."
+                )
+            },
+            {
+                "role": "user",
+                "content": (
+                    f"Suggest {missing} more tracks for this request: {request}.{favorites}\n"
+                    f"Do not repeat any of these tracks:\n{chosen}"
+                )
+            }
+        ]
+
+    def _salvage_playlist(self, content: str) -> Tuple[str | None, List[dict]]:
+        """Extract the name and every complete track, even from truncated JSON"""
+        name = None
+        candidates = []
+        for event, data in PlaylistStreamParser().feed(content or ""):
+            if event == "name":
+                name = data
+            else:
+                candidates.append(data)
+        return name, candidates
+
+    def _add_tracks(self, candidates: List[dict], tracks: List[dict], seen: set, track_count: int) -> List[dict]:
+        """Append valid, not yet chosen tracks up to `track_count`; return the added ones"""
+        added = []
+        for candidate in candidates:
+            if len(tracks) >= track_count:
+                break
+            try:
+                track = Track.model_validate(candidate).model_dump()
+            except Exception as e:
+                logger.debug(f"Skipping invalid track: {str(e)}")
+                continue
+            key = track_key(track["name"], track["artist"])
+            if key in seen:
+                continue
+            seen.add(key)
+            tracks.append(track)
+            added.append(track)
+        return added
+
+    async def _top_up(self, request: str, track_count: int, tracks: List[dict], seen: set,
+                      liked_artists_names: list[str] = None) -> AsyncIterator[dict]:
+        """Ask only for the missing tracks instead of regenerating the playlist.
+
+        A failed top-up call ends the top-up; the tracks already chosen are kept.
+        """
+        for attempt in range(self.MAX_TOP_UP_ATTEMPTS):
+            missing = track_count - len(tracks)
+            if missing <= 0:
+                return
+            logger.info(f"Topping up playlist: {missing} missing tracks (attempt {attempt + 1})")
+            try:
+                with OPENAI_REQUEST_DURATION.time("openai", operation="top_up"):
+                    response = await self.client.chat.completions.create(
+                        model=self.MODEL,
+                        messages=self._build_top_up_messages(request, missing, tracks, liked_artists_names),
+                        temperature=self.TEMPERATURE,
+                        max_tokens=100 + missing * self.TOP_UP_TOKENS_PER_TRACK,
+                        response_format={"type": "json_object"}
+                    )
+            except Exception as e:
+                logger.warning(f"Top-up failed, keeping {len(tracks)} tracks: {str(e)}")
+                return
+            self._record_usage(response)
+            _, candidates = self._salvage_playlist(response.choices[0].message.content)
+            for track in self._add_tracks(candidates, tracks, seen, track_count):
+                yield track
+
+    def _finish_playlist(self, name: str | None, tracks: List[dict], request: str, track_count: int) -> Dict[str, any]:
+        if not tracks:
+            raise ValueError("Invalid response format: no valid tracks")
+        if len(tracks) < track_count:
+            logger.warning(f"Returning partial playlist: got {len(tracks)}, expected {track_count}")
+        return {
+            "name": (name or request)[:50],
+            "tracks": tracks
+        }
+
+    async def _generate_playlist(self, request: str, track_count: int, liked_artists_names: list[str] = None) -> Dict[str, any]:
         try:
             logger.info(f"Generating playlist for request: {request} with {track_count} tracks")
             
             # Log the API call parameters
-            logger.info("Making OpenAI API call with parameters:")
-            logger.info(f"Model: gpt-3.5-turbo")
-            logger.info(f"Temperature: 0.7")
-            logger.info(f"Max tokens: 2000")
+            logger.debug(f"OpenAI call parameters: {self.model_params()}")
 
-            if liked_artists_names is not None:
-                liked_artists_message = f"Consider the following artists as favorites: {', '.join(liked_artists_names)}"
-            else:
-                liked_artists_message = ""
-
-            messages = [
-                    {
-                        "role": "system",
-                        "content": f"""You are a music expert that generates playlists based on user requests.
-                        You must return a valid JSON object with a playlist name and exactly {track_count} tracks.
-                        The playlist name should be short, catchy, and reflect the theme of the playlist.
-                        Each track must have a name and artist.
-                        Make sure the tracks are diverse and match the user's request.
-
-                        If favourite artists are provided consider them in the playlist, but only if they are relevant to the request.
-                        
-                        Important: Ensure the response is a complete, valid JSON object.
-                        The response must match this exact schema:
-                        {{
-                            "name": "string (max 50 chars)",
-                            "tracks": [
-                                {{
-                                    "name": "string",
-                                    "artist": "string"
-                                }}
-                            ]
-                        }}"""
-                    },
-                    {
-                        "role": "user",
-                        "content": f"""
-                        Generate a playlist of exactly {track_count} tracks based on this request: {request}. 
-                        {liked_artists_message}"""
-                    }
-                ]
+            messages = self._build_messages(request, track_count, liked_artists_names)
             
-            logger.info(f"Request for openai: {messages}")
-
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=messages,
-                temperature=0.7,
-                max_tokens=2000,
-                response_format={"type": "json_object"}
-            )
+            logger.debug(f"Request for openai: {messages}")
+
+            with OPENAI_REQUEST_DURATION.time("openai", operation="generate"):
+                response = await self.client.chat.completions.create(
+                    model=self.MODEL,
+                    messages=messages,
+                    temperature=self.TEMPERATURE,
+                    max_tokens=self.MAX_TOKENS,
+                    response_format={"type": "json_object"}
+                )
+            self._record_usage(response)
             
-            logger.info("Received response from OpenAI API")
+            logger.debug("Received response from OpenAI API")
             
             # Extract the response content
             content = response.choices[0].message.content
-            logger.info(f"Raw response content: {content}")
-            
-            # Parse the JSON response using Pydantic
-            try:
-                # Ensure the response is complete JSON
-                if not content.strip().endswith('}'):
-                    raise ValueError("Incomplete JSON response")
-                
-                playlist_data = PlaylistResponse.model_validate_json(content)
-                tracks = [track.model_dump() for track in playlist_data.tracks]
-                tracks = tracks[:track_count]
-                logger.info(f"Successfully parsed JSON response. Number of tracks: {len(tracks)}")
-            except Exception as e:
-                logger.info(f"Failed to parse JSON response: {str(e)}")
-                raise ValueError(f"Invalid response format: {str(e)}")
-            
-            # Ensure we have the correct number of tracks
-            if len(tracks) != track_count:
-                logger.info(f"Invalid number of tracks: got {len(tracks)}, expected {track_count}")
-                raise ValueError(f"Invalid number of tracks: got {len(tracks)}, expected {track_count}")
+            logger.debug(f"Raw response content: {content}")
             
+            name, candidates = self._salvage_playlist(content)
+            tracks = []
+            seen = set()
+            self._add_tracks(candidates, tracks, seen, track_count)
+            logger.debug(f"Parsed {len(tracks)} valid tracks from response")
+            async for _ in self._top_up(request, track_count, tracks, seen, liked_artists_names):
+                pass
+            playlist = self._finish_playlist(name, tracks, request, track_count)
             logger.info("Successfully generated playlist")
-            return {
-                "name": playlist_data.name,
-                "tracks": tracks
-            }
+            return playlist
 
         except Exception as e:
             logger.error(f"Error generating playlist: {str(e)}", exc_info=True)
-            raise 
\ No newline at end of file
+            raise
\ No newline at end of file
@@ -0,0 +1,93 @@
+import os
+import json
+import time
+import hashlib
+import logging
+from typing import Iterable, Optional
+
+from .cache import LRUCache, MISSING, PurgeThrottle
+from .track_cache import normalize
+
+logger = logging.getLogger(__name__)
+
+PLAYLIST_CACHE_TTL = float(os.getenv('PLAYLIST_CACHE_TTL', str(24 * 3600)))
+PLAYLIST_CACHE_MEMORY_SIZE = int(os.getenv('PLAYLIST_CACHE_MEMORY_SIZE', '256'))
+# Generated playlists kept in the playlist_cache table
+PLAYLIST_CACHE_MAX_ROWS = int(os.getenv('PLAYLIST_CACHE_MAX_ROWS', '5000'))
+
+
+def playlist_cache_key(request: str, track_count: int, model_params: dict,
+                       liked_artists_names: Optional[Iterable[str]]) -> str:
+    """Build a stable key from everything that shapes a generated playlist"""
+    favorites = None
+    if liked_artists_names is not None:
+        names = sorted({normalize(name) for name in liked_artists_names})
+        favorites = hashlib.sha256('\n'.join(names).encode()).hexdigest()
+    payload = json.dumps({
+        'request': normalize(request),
+        'track_count': track_count,
+        'model': model_params,
+        'favorites': favorites,
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class PlaylistCache:
+    """Generated playlist cache: an in-process LRU with an optional SQLite tier"""
+
+    def __init__(self, db=None, maxsize: int = PLAYLIST_CACHE_MEMORY_SIZE, ttl: float = PLAYLIST_CACHE_TTL,
+                 max_rows: int = PLAYLIST_CACHE_MAX_ROWS):
+        self.db = db
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self._purge = PurgeThrottle()
+        self.memory = LRUCache(maxsize=maxsize, ttl=ttl)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[dict]:
+        playlist = self.memory.get(key)
+        if playlist is MISSING and self.db is not None:
+            row = self.db.get_cached_playlist(key)
+            if row is not None:
+                response, cached_at = row
+                age = time.time() - cached_at
+                if age < self.ttl:
+                    playlist = json.loads(response)
+                    self.memory.set(key, playlist, ttl=self.ttl - age)
+
+        if playlist is MISSING:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return playlist
+
+    def set(self, key: str, playlist: dict):
+        self.memory.set(key, playlist)
+        if self.db is not None:
+            now = time.time()
+            self.db.cache_playlist(key, json.dumps(playlist), now)
+            if self._purge.due(now):
+                self.db.purge_cached_playlists(now - self.ttl, self.max_rows)
+
+    async def aget(self, key: str) -> Optional[dict]:
+        """get, with the SQLite tier read on the database thread pool"""
+        if self.db is None:
+            return self.get(key)
+        return await self.db.run(self.get, key)
+
+    async def aset(self, key: str, playlist: dict):
+        if self.db is None:
+            self.set(key, playlist)
+        else:
+            await self.db.run(self.set, key, playlist)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'persistent': self.db is not None,
+            'memory': self.memory.stats(),
+        }
@@ -0,0 +1,112 @@
+import bisect
+from typing import List, Sequence, Tuple
+
+# Spotify accepts at most this many items per add, replace or remove call
+SPOTIFY_MAX_ITEMS = 100
+
+
+def chunked(items: Sequence, size: int = SPOTIFY_MAX_ITEMS) -> List[Sequence]:
+    return [items[start:start + size] for start in range(0, len(items), size)]
+
+
+def _longest_increasing(values: List[int]) -> set:
+    """Positions of one longest strictly increasing subsequence of `values`"""
+    tails, tail_positions = [], []
+    previous = [-1] * len(values)
+    for position, value in enumerate(values):
+        index = bisect.bisect_left(tails, value)
+        if index:
+            previous[position] = tail_positions[index - 1]
+        if index == len(tails):
+            tails.append(value)
+            tail_positions.append(position)
+        else:
+            tails[index] = value
+            tail_positions[index] = position
+    kept = set()
+    position = tail_positions[-1] if tail_positions else -1
+    while position >= 0:
+        kept.add(position)
+        position = previous[position]
+    return kept
+
+
+class PlaylistDiff:
+    """The Spotify calls that turn one list of track IDs into another.
+
+    Applied in order: `removals` (track IDs, removed wherever they are),
+    then `moves` as (range_start, insert_before, range_length) reorders,
+    then `additions` as (position, track IDs) inserts. Positions are those of
+    the playlist at the time each call is made.
+    """
+
+    def __init__(self, removals: List[str], moves: List[Tuple[int, int, int]],
+                 additions: List[Tuple[int, List[str]]]):
+        self.removals = removals
+        self.moves = moves
+        self.additions = additions
+
+    def __bool__(self) -> bool:
+        return bool(self.removals or self.moves or self.additions)
+
+    @property
+    def api_calls(self) -> int:
+        return len(chunked(self.removals)) + len(self.moves) + sum(len(chunked(ids)) for _, ids in self.additions)
+
+    def summary(self) -> dict:
+        return {
+            'removed': len(self.removals),
+            'moved': sum(length for _, _, length in self.moves),
+            'added': sum(len(ids) for _, ids in self.additions),
+            'api_calls': self.api_calls,
+        }
+
+
+def diff_playlist(old: Sequence[str], new: Sequence[str]) -> PlaylistDiff:
+    """Diff two lists of unique track IDs.
+
+    Tracks that keep their relative order (a longest increasing subsequence)
+    stay put and every other kept track is moved once, with neighbouring
+    tracks moved together, so the number of calls grows with the size of the
+    change rather than the size of the playlist.
+    """
+    new_set = set(new)
+    old_set = set(old)
+    removals = [track_id for track_id in old if track_id not in new_set]
+
+    current = [track_id for track_id in old if track_id in new_set]
+    target = [track_id for track_id in new if track_id in old_set]
+    rank = {track_id: index for index, track_id in enumerate(target)}
+    stable = {current[position] for position in _longest_increasing([rank[track_id] for track_id in current])}
+
+    # Put each unstable track right after its predecessor in the target order
+    moves = []
+    index = 0
+    while index < len(target):
+        if target[index] in stable:
+            index += 1
+            continue
+        start = current.index(target[index])
+        length = 1
+        while (index + length < len(target) and target[index + length] not in stable
+               and start + length < len(current) and current[start + length] == target[index + length]):
+            length += 1
+        insert_before = current.index(target[index - 1]) + 1 if index else 0
+        if insert_before != start:
+            moves.append((start, insert_before, length))
+            block = current[start:start + length]
+            del current[start:start + length]
+            destination = insert_before - length if insert_before > start else insert_before
+            current[destination:destination] = block
+        index += length
+
+    # Insert runs of new tracks in target order, so every earlier track is already in place
+    additions = []
+    for position, track_id in enumerate(new):
+        if track_id in old_set:
+            continue
+        if additions and additions[-1][0] + len(additions[-1][1]) == position:
+            additions[-1][1].append(track_id)
+        else:
+            additions.append((position, [track_id]))
+    return PlaylistDiff(removals, moves, additions)
@@ -0,0 +1,88 @@
+import json
+import logging
+from typing import List, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class PlaylistStreamParser:
+    """Incrementally scan a streamed playlist JSON object.
+
+    Feed it text as it arrives; it returns ("name", str) once the top-level
+    playlist name is complete and ("track", dict) for every object in the
+    top-level "tracks" array as soon as its closing brace arrives. The scanner
+    only tracks strings, nesting and keys, so it never re-parses the buffer.
+    """
+
+    def __init__(self):
+        self.buffer = ''
+        self._pos = 0
+        # One entry per open container: [kind, current key, expecting a key]
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._track_start = None
+        self._name_sent = False
+
+    def feed(self, text: str) -> List[Tuple[str, object]]:
+        self.buffer += text
+        events = []
+        buffer = self.buffer
+        for i in range(self._pos, len(buffer)):
+            char = buffer[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    self._on_string(json.loads(buffer[self._string_start:i + 1]), events)
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = i
+            elif char == '{':
+                if self._in_tracks_array():
+                    self._track_start = i
+                self._stack.append(['{', None, True])
+            elif char == '[':
+                self._stack.append(['[', None, False])
+            elif char in '}]':
+                if not self._stack:
+                    continue
+                self._stack.pop()
+                if char == '}' and self._track_start is not None and self._in_tracks_array():
+                    self._on_track(buffer[self._track_start:i + 1], events)
+                    self._track_start = None
+            elif char == ':' and self._stack and self._stack[-1][0] == '{':
+                self._stack[-1][2] = False
+            elif char == ',' and self._stack and self._stack[-1][0] == '{':
+                self._stack[-1][2] = True
+        self._pos = len(buffer)
+        return events
+
+    def _in_tracks_array(self) -> bool:
+        return (
+            len(self._stack) == 2
+            and self._stack[0][1] == 'tracks'
+            and self._stack[1][0] == '['
+        )
+
+    def _on_string(self, value: str, events: list):
+        if not self._stack or self._stack[-1][0] != '{':
+            return
+        level = self._stack[-1]
+        if level[2]:
+            level[1] = value
+        elif len(self._stack) == 1 and level[1] == 'name' and not self._name_sent:
+            self._name_sent = True
+            events.append(('name', value))
+
+    def _on_track(self, text: str, events: list):
+        try:
+            events.append(('track', json.loads(text)))
+        except ValueError as e:
+            logger.warning(f"Skipping malformed streamed track: {e}")
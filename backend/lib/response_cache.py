@@ -0,0 +1,116 @@
+import os
+import gzip
+import json
+import hashlib
+import logging
+from typing import Awaitable, Callable, Optional
+
+from fastapi import Request, Response
+
+from .cache import LRUCache, MISSING
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_CACHE_SIZE = int(os.getenv('RESPONSE_CACHE_SIZE', '64'))
+# Smaller bodies are sent uncompressed
+COMPRESSION_MIN_SIZE = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+class CachedResponse:
+    """A serialized JSON body with its ETag and lazily built compressed variants"""
+
+    def __init__(self, body: bytes, etag: Optional[str]):
+        self.body = body
+        self.etag = etag
+        self._encoded = {}
+
+    def encoded(self, encoding: str) -> bytes:
+        # Compressed once per entry; a race only compresses twice
+        if encoding not in self._encoded:
+            if encoding == 'br':
+                self._encoded[encoding] = brotli.compress(self.body, quality=BROTLI_QUALITY)
+            else:
+                self._encoded[encoding] = gzip.compress(self.body, compresslevel=GZIP_LEVEL, mtime=0)
+        return self._encoded[encoding]
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    accepted = {
+        part.split(';')[0].strip().lower()
+        for part in accept_encoding.split(',')
+        if not part.strip().endswith(';q=0')
+    }
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted:
+        return 'gzip'
+    return None
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = {tag.strip() for tag in if_none_match.split(',')}
+    # Compressed variants carry the encoding in their ETag; any of them validates
+    return '*' in tags or any(tag == etag or tag.startswith(etag[:-1] + '-') for tag in tags)
+
+
+class ResponseCache:
+    """Serialized responses keyed by catalog version and request parameters.
+
+    Every artist write bumps the catalog version, so an entry never goes
+    stale: a new version simply misses. ETags are derived from the same key,
+    so a matching `If-None-Match` is answered with 304 without touching the
+    cache or re-running the query.
+    """
+
+    def __init__(self, maxsize: int = RESPONSE_CACHE_SIZE):
+        self.memory = LRUCache(maxsize=maxsize)
+        self.not_modified = 0
+
+    @staticmethod
+    def etag(version: int, params: dict) -> str:
+        digest = hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()[:16]
+        return f'"{version}-{digest}"'
+
+    async def respond(self, request: Request, version: int, params: dict,
+                      build: Callable[[], Awaitable[dict]]) -> Response:
+        """Answer with 304, a cached body, or a body built by `build()`.
+
+        `build` returns the response data including the catalog `version` it
+        was read at. If that differs from `version`, the catalog changed in
+        between: the body is sent without an ETag and is not cached.
+        """
+        etag = self.etag(version, params)
+        headers = {'Vary': 'Accept-Encoding', 'Cache-Control': 'no-cache'}
+        if etag_matches(request.headers.get('if-none-match'), etag):
+            self.not_modified += 1
+            return Response(status_code=304, headers={**headers, 'ETag': etag})
+
+        cached = self.memory.get(etag)
+        if cached is MISSING:
+            data = await build()
+            consistent = data.get('version') == version
+            cached = CachedResponse(json.dumps(data, separators=(',', ':')).encode(), etag if consistent else None)
+            if consistent:
+                self.memory.set(etag, cached)
+
+        body = cached.body
+        encoding = choose_encoding(request.headers.get('accept-encoding', ''))
+        if encoding and len(body) >= COMPRESSION_MIN_SIZE:
+            body = cached.encoded(encoding)
+            headers['Content-Encoding'] = encoding
+        if cached.etag:
+            # Each encoding is a different representation, so it gets its own strong ETag
+            headers['ETag'] = f'{cached.etag[:-1]}-{encoding}"' if 'Content-Encoding' in headers else cached.etag
+        return Response(content=body, media_type='application/json', headers=headers)
+
+    def stats(self) -> dict:
+        return {**self.memory.stats(), 'not_modified': self.not_modified}
@@ -0,0 +1,142 @@
+import time
+import asyncio
+import inspect
+import logging
+import threading
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from .cache import MISSING
+
+logger = logging.getLogger(__name__)
+
+# Builds a service from the container, which supplies its dependencies
+Factory = Callable[['Services'], Any]
+# Called with the service; may return an awaitable
+Hook = Callable[[Any], Any]
+
+
+async def _maybe_await(result):
+    if inspect.isawaitable(result):
+        return await result
+    return result
+
+
+class Services:
+    """Application services, each built on first use.
+
+    A service is registered with a factory that receives the container, so
+    its dependencies are looked up (and built) only when it is. Importing the
+    app builds nothing; a factory that raises breaks only the routes using
+    that service, and the next use tries again.
+
+    `start` runs right after a service is built inside the event loop and may
+    return a background task, cancelled on close. `warm_up` runs for the
+    services named in `warm_up()`, to open pools and fill caches before the
+    first request.
+    """
+
+    def __init__(self):
+        self._factories: Dict[str, Factory] = {}
+        self._hooks: Dict[str, Dict[str, Optional[Hook]]] = {}
+        self._instances: Dict[str, Any] = {}
+        self._errors: Dict[str, str] = {}
+        self._build_seconds: Dict[str, float] = {}
+        self._tasks = []
+        # Re-entrant: factories look up their dependencies while holding it
+        self._lock = threading.RLock()
+
+    def register(self, name: str, factory: Factory, start: Optional[Hook] = None,
+                 warm_up: Optional[Hook] = None, close: Optional[Hook] = None):
+        self._factories[name] = factory
+        self._hooks[name] = {'start': start, 'warm_up': warm_up, 'close': close}
+
+    def override(self, name: str, instance: Any):
+        """Use an already built instance, e.g. a fake in a script"""
+        with self._lock:
+            self._instances[name] = instance
+            self._errors.pop(name, None)
+
+    def get(self, name: str) -> Any:
+        instance = self._instances.get(name, MISSING)
+        if instance is not MISSING:
+            return instance
+        if name not in self._factories:
+            raise KeyError(f"Unknown service: {name}")
+        with self._lock:
+            instance = self._instances.get(name, MISSING)
+            if instance is not MISSING:
+                return instance
+            start = time.perf_counter()
+            try:
+                instance = self._factories[name](self)
+            except Exception as e:
+                self._errors[name] = str(e)
+                logger.error(f"Could not start {name}: {str(e)}")
+                raise
+            self._build_seconds[name] = time.perf_counter() - start
+            self._errors.pop(name, None)
+            self._instances[name] = instance
+            logger.info(f"Started {name} in {self._build_seconds[name] * 1000:.1f} ms")
+
+        start_hook = self._hooks[name]['start']
+        if start_hook is not None:
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                # Built outside the event loop (a script or a worker thread); nothing to start
+                return instance
+            task = start_hook(instance)
+            if task is not None:
+                self._tasks.append(task)
+        return instance
+
+    def built(self, name: str) -> Optional[Any]:
+        """The service if it has been built, else None; never builds it"""
+        return self._instances.get(name)
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith('_') or name not in self._factories:
+            raise AttributeError(name)
+        return self.get(name)
+
+    async def warm_up(self, names: Iterable[str]) -> Dict[str, str]:
+        """Build the named services and run their warm-up hooks; returns errors by service"""
+        errors = {}
+        for name in names:
+            try:
+                instance = self.get(name)
+                hook = self._hooks[name]['warm_up']
+                if hook is not None:
+                    await _maybe_await(hook(instance))
+            except Exception as e:
+                self._errors[name] = str(e)
+                errors[name] = str(e)
+                logger.error(f"Warm-up of {name} failed: {str(e)}")
+        return errors
+
+    def status(self) -> Dict[str, dict]:
+        """Which services are built, how long each took and the last error of those that are not"""
+        return {
+            name: {
+                'started': name in self._instances,
+                'start_ms': round(self._build_seconds[name] * 1000, 1) if name in self._build_seconds else None,
+                'error': self._errors.get(name)
+            }
+            for name in self._factories
+        }
+
+    async def close(self):
+        """Cancel background tasks and close the built services, dependents first"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for name in reversed(list(self._instances)):
+            hook = self._hooks.get(name, {}).get('close')
+            if hook is None:
+                continue
+            try:
+                await _maybe_await(hook(self._instances[name]))
+            except Exception as e:
+                logger.error(f"Error closing {name}: {str(e)}")
+        self._instances.clear()
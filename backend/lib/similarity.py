@@ -0,0 +1,164 @@
+import os
+import re
+import time
+import logging
+import threading
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Rebuild the matrix at least this often, even without an explicit invalidate()
+SIMILARITY_REBUILD_TTL = float(os.getenv('SIMILARITY_REBUILD_TTL', '300'))
+# How much a disliked artist pushes recommendations away from it
+DISLIKE_WEIGHT = 0.5
+
+_WORD_RE = re.compile(r'[a-z0-9]+')
+
+
+def artist_features(artist: dict) -> List[str]:
+    """Sparse features for one artist: its genres, the words in them and its related artists.
+
+    Every artist also carries its own ID as a related feature, so an artist
+    listed as related shares a feature with the artist it points to.
+    """
+    features = []
+    for genre in artist.get('genres') or []:
+        genre = genre.lower()
+        features.append(f'genre:{genre}')
+        features.extend(f'word:{word}' for word in _WORD_RE.findall(genre))
+    features.append(f"related:{artist['id']}")
+    features.extend(f'related:{related_id}' for related_id in artist.get('related') or [])
+    return features
+
+
+class SimilarityEngine:
+    """Cosine similarity between synced artists, without calling the LLM.
+
+    Artists are embedded as TF-IDF weighted, L2-normalised vectors over their
+    genres, genre words and related artists. The matrix is built lazily from
+    the `artists` table and rebuilt after `invalidate()` or once it is older
+    than the rebuild TTL; queries are a single matrix-vector product.
+    """
+
+    def __init__(self, db, rebuild_ttl: float = SIMILARITY_REBUILD_TTL):
+        self.db = db
+        self.rebuild_ttl = rebuild_ttl
+        self._lock = threading.Lock()
+        self._built_at = None
+        self._snapshot = None
+
+    def warm_up(self):
+        """Build the matrix now rather than on the first query"""
+        self._ensure_built()
+
+    def invalidate(self):
+        with self._lock:
+            self._built_at = None
+
+    def _ensure_built(self) -> '_Snapshot':
+        with self._lock:
+            if self._built_at is None or time.monotonic() - self._built_at >= self.rebuild_ttl:
+                self._snapshot = self._build(self.db.get_artist_features())
+                self._built_at = time.monotonic()
+            return self._snapshot
+
+    def _build(self, artists: List[dict]) -> '_Snapshot':
+        documents = [artist_features(artist) for artist in artists]
+        vocabulary = {}
+        for features in documents:
+            for feature in features:
+                vocabulary.setdefault(feature, len(vocabulary))
+
+        counts = np.zeros((len(artists), len(vocabulary)), dtype=np.float32)
+        for row, features in enumerate(documents):
+            for feature in features:
+                counts[row, vocabulary[feature]] += 1
+
+        document_frequency = (counts > 0).sum(axis=0)
+        idf = np.log((1 + len(artists)) / (1 + document_frequency)).astype(np.float32) + 1
+        matrix = counts * idf
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+
+        logger.info(f"Built similarity matrix for {len(artists)} artists and {len(vocabulary)} features")
+        return _Snapshot(artists, vocabulary, idf, matrix / norms)
+
+    def similar_to(self, seed_ids: List[str], k: int = 10,
+                   exclude: Iterable[str] = ()) -> List[Tuple[dict, float]]:
+        """Artists closest to the seeds' centroid, with their cosine scores"""
+        snapshot = self._ensure_built()
+        return snapshot.top_k(snapshot.centroid(seed_ids), k, [*seed_ids, *exclude])
+
+    def recommend(self, k: int = 10) -> List[Tuple[dict, float]]:
+        """More like the liked artists, away from the disliked ones"""
+        liked = self.db.get_artist_ids('like')
+        disliked = self.db.get_artist_ids('dislike')
+        snapshot = self._ensure_built()
+        profile = snapshot.centroid(liked)
+        if profile is None:
+            return []
+        disliked_profile = snapshot.centroid(disliked)
+        if disliked_profile is not None:
+            profile = profile - DISLIKE_WEIGHT * disliked_profile
+        return snapshot.top_k(profile, k, [*liked, *disliked])
+
+    def search(self, text: str, k: int = 10) -> List[Tuple[dict, float]]:
+        """Artists whose genres best match the words in a free-text request"""
+        snapshot = self._ensure_built()
+        profile = np.zeros(len(snapshot.vocabulary), dtype=np.float32)
+        for word in _WORD_RE.findall(text.lower()):
+            column = snapshot.vocabulary.get(f'word:{word}')
+            if column is not None:
+                profile[column] += snapshot.idf[column]
+        if not profile.any():
+            return []
+        return snapshot.top_k(profile, k, ())
+
+    def stats(self) -> dict:
+        snapshot = self._snapshot
+        return {
+            'artists': len(snapshot.artists) if snapshot else 0,
+            'features': len(snapshot.vocabulary) if snapshot else 0,
+            'age': None if self._built_at is None else time.monotonic() - self._built_at,
+        }
+
+
+class _Snapshot:
+    """One immutable build of the matrix, so a rebuild never races a query"""
+
+    def __init__(self, artists: List[dict], vocabulary: dict, idf: np.ndarray, matrix: np.ndarray):
+        self.artists = artists
+        self.index = {artist['id']: row for row, artist in enumerate(artists)}
+        self.vocabulary = vocabulary
+        self.idf = idf
+        self.matrix = matrix
+
+    def centroid(self, artist_ids: Iterable[str]) -> Optional[np.ndarray]:
+        rows = [self.index[artist_id] for artist_id in artist_ids if artist_id in self.index]
+        if not rows:
+            return None
+        return self.matrix[rows].mean(axis=0)
+
+    def top_k(self, profile: Optional[np.ndarray], k: int, exclude: Iterable[str]) -> List[Tuple[dict, float]]:
+        if profile is None or not self.artists:
+            return []
+        norm = np.linalg.norm(profile)
+        if norm == 0:
+            return []
+        scores = self.matrix @ (profile / norm)
+        for artist_id in exclude:
+            if artist_id in self.index:
+                scores[self.index[artist_id]] = -np.inf
+
+        k = min(k, len(scores))
+        if k <= 0:
+            return []
+        candidates = np.argpartition(-scores, k - 1)[:k]
+        ranked = candidates[np.argsort(-scores[candidates])]
+        return [
+            (self.artists[row], float(scores[row]))
+            for row in ranked
+            if scores[row] > 0
+        ]
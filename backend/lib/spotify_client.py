@@ -1,26 +1,70 @@
 import os
-import spotipy
-from spotipy.oauth2 import SpotifyOAuth
+import asyncio
 import logging
+from typing import Optional
+from .playlist_diff import PlaylistDiff, SPOTIFY_MAX_ITEMS, chunked
 from .token_manager import TokenManager
+from .spotify_scheduler import SpotifyScheduler, INTERACTIVE, BACKGROUND
 
 logger = logging.getLogger(__name__)
 
+TIME_RANGES = ('short_term', 'medium_term', 'long_term')
+TOP_ARTISTS_LIMIT = int(os.getenv('SPOTIFY_TOP_ARTISTS_LIMIT', '200'))
+# Damping constant for reciprocal rank fusion when merging time ranges
+RANK_FUSION_K = 60
+# Keep-alive connections shared by all concurrent Spotify calls
+SPOTIFY_POOL_SIZE = int(os.getenv('SPOTIFY_POOL_SIZE', '16'))
+# Web API base URL, overridable to point at a local stand-in
+SPOTIFY_API_URL = os.getenv('SPOTIFY_API_URL')
+
 class SpotifyClient:
     def __init__(self):
         self.client_id = os.getenv('SPOTIFY_CLIENT_ID')
         self.client_secret = os.getenv('SPOTIFY_CLIENT_SECRET')
         self.redirect_uri = os.getenv('SPOTIFY_REDIRECT_URI')
-        self.token_manager = TokenManager()
-        
+        self.token_manager = TokenManager(auth_manager_factory=self.get_auth_manager)
+        # spotipy and requests load here rather than at import, so the app starts without them
+        import spotipy
+        # One long-lived client; the token manager supplies the current token per request
+        self.sp = spotipy.Spotify(auth_manager=self.token_manager, requests_session=self._build_session())
+        if SPOTIFY_API_URL:
+            self.sp.prefix = SPOTIFY_API_URL.rstrip('/') + '/'
+        self.scheduler = SpotifyScheduler(max_workers=SPOTIFY_POOL_SIZE)
+
+    def _build_session(self):
+        """Session with a keep-alive pool large enough for concurrent calls.
+
+        Only connection errors are retried here; 429 and 5xx responses are
+        surfaced to the scheduler, which honours Retry-After.
+        """
+        import requests
+        from urllib3.util.retry import Retry
+
+        session = requests.Session()
+        retry = Retry(
+            total=2,
+            connect=2,
+            read=False,
+            status=0,
+            allowed_methods=frozenset(['GET', 'POST', 'PUT', 'DELETE']),
+            backoff_factor=0.3,
+            status_forcelist=(),
+            # Otherwise urllib3 retries 429s itself and the headers never reach the scheduler
+            respect_retry_after_header=False
+        )
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=SPOTIFY_POOL_SIZE,
+            pool_maxsize=SPOTIFY_POOL_SIZE,
+            max_retries=retry
+        )
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
 
     def _init_spotify(self):
-        """Initialize Spotify client with current token"""
+        """Make sure a valid token is available, refreshing it if needed"""
         token_data = self.token_manager.get_token()
-        if token_data and 'access_token' in token_data:
-            logger.info(f"initializing spotify with token {token_data['access_token']}")
-            self.sp = spotipy.Spotify(auth=token_data['access_token'])
-        else:
+        if not token_data or 'access_token' not in token_data:
             raise Exception("No token found")
 
     def get_auth_url(self):
@@ -29,6 +73,8 @@ class SpotifyClient:
         return self.get_auth_manager().get_authorize_url()
 
     def get_auth_manager(self):
+        from spotipy.oauth2 import SpotifyOAuth
+
         return SpotifyOAuth(
             client_id=self.client_id,
             client_secret=self.client_secret,
@@ -41,7 +87,6 @@ class SpotifyClient:
         try:
             
             token_info = self.get_auth_manager().get_access_token(code)
-            logger.info(f"save token with {token_info}")
             if token_info:
                 self.token_manager.save_token(token_info)
                 self._init_spotify()
@@ -50,80 +95,183 @@ class SpotifyClient:
             logger.error(f"Error getting access token: {str(e)}")
             return {'error': str(e)}
 
-    def get_top_artists(self, limit=50):
-        """Get user's top artists"""
+    async def get_top_artists(self, time_ranges=('long_term',), max_artists=TOP_ARTISTS_LIMIT):
+        """Get user's top artists for one or more time ranges.
+
+        Every (time range, offset) page is requested concurrently. The results
+        are merged into one list ranked by reciprocal rank fusion, and every
+        artist carries the `time_ranges` it appeared in.
+        """
         try:
+            invalid = [r for r in time_ranges if r not in TIME_RANGES]
+            if invalid:
+                raise ValueError(f"Invalid time range(s): {', '.join(invalid)}")
+
             self._init_spotify()  # Refresh token if needed
-            all_artists = []
             batch_size = 50  # Spotify's maximum limit
-            total_artists = 200  # Total number of artists we want
-            offset = 0
-
-            while len(all_artists) < total_artists:
-                # Get batch of artists with same parameters as original call
-                logger.info(f"Getting batch of artists from {offset} to {offset + batch_size}")
-                batch = self.sp.current_user_top_artists(
-                    limit=batch_size,
-                    time_range='long_term',
+            pages = [
+                (time_range, offset)
+                for time_range in time_ranges
+                for offset in range(0, max_artists, batch_size)
+            ]
+            logger.info(f"Getting {len(pages)} pages of top artists for {', '.join(time_ranges)}")
+            batches = await asyncio.gather(*(
+                self.scheduler.call(
+                    self.sp.current_user_top_artists,
+                    limit=min(batch_size, max_artists - offset),
+                    time_range=time_range,
                     offset=offset,
+                    priority=BACKGROUND
                 )
-                
-                if not batch.get('items'):
-                    break
-                    
-                all_artists.extend(batch['items'])
-                offset += batch_size
+                for time_range, offset in pages
+            ))
 
-                # If we got less than the batch size, we've reached the end
-                if len(batch['items']) < batch_size:
-                    break
+            merged = {}
+            scores = {}
+            for (time_range, offset), batch in zip(pages, batches):
+                for position, artist in enumerate(batch.get('items') or [], start=offset):
+                    if artist['id'] not in merged:
+                        merged[artist['id']] = {**artist, 'time_ranges': []}
+                        scores[artist['id']] = 0.0
+                    merged[artist['id']]['time_ranges'].append(time_range)
+                    scores[artist['id']] += 1.0 / (RANK_FUSION_K + position + 1)
+
+            ranked = sorted(merged.values(), key=lambda artist: scores[artist['id']], reverse=True)
+            for artist in ranked:
+                artist['time_ranges'] = [r for r in TIME_RANGES if r in artist['time_ranges']]
 
             # Return in the same format as spotipy
             return {
-                'items': all_artists[:total_artists],
-                'total': len(all_artists[:total_artists]),
+                'items': ranked,
+                'total': len(ranked),
                 'limit': batch_size,
-                'offset': 0
+                'offset': 0,
+                'time_ranges': list(time_ranges)
             }
         except Exception as e:
             logger.error(f"Error getting top artists: {str(e)}")
             return {'error': str(e)}
 
-    async def search_track(self, name: str, artist: str) -> str | None:
-        """Search for a track on Spotify and return its ID"""
+    async def get_related_artists(self, artist_ids: list[str]) -> dict[str, list[str]]:
+        """Related artist IDs for each artist, fetched concurrently in the background lane.
+
+        Artists whose lookup fails are left out, so a sync still succeeds.
+        """
+        self._init_spotify()
+        results = await asyncio.gather(*(
+            self.scheduler.call(self.sp.artist_related_artists, artist_id, priority=BACKGROUND)
+            for artist_id in artist_ids
+        ), return_exceptions=True)
+
+        related = {}
+        for artist_id, result in zip(artist_ids, results):
+            if isinstance(result, Exception):
+                logger.warning(f"Could not get related artists for {artist_id}: {str(result)}")
+                continue
+            related[artist_id] = [artist['id'] for artist in result.get('artists') or []]
+        return related
+
+    async def get_artist_top_tracks(self, artist_id: str) -> list[dict]:
+        """An artist's top tracks as {name, artist} dicts"""
+        results = await self.scheduler.call(self.sp.artist_top_tracks, artist_id, priority=INTERACTIVE)
+        return [
+            {'name': track['name'], 'artist': track['artists'][0]['name'] if track['artists'] else ''}
+            for track in results.get('tracks') or []
+        ]
+
+    async def search_tracks(self, query: str, limit: int = 5) -> list[dict]:
+        """Candidate tracks for a search query, as {id, name, artists, popularity} dicts.
+
+        Request errors are raised so callers can tell them apart from a miss.
+        """
         try:
-            query = f"track:{name} artist:{artist}"
-            results = self.sp.search(q=query, type='track', limit=1)
-            
-            if results['tracks']['items']:
-                return results['tracks']['items'][0]['id']
-            return None
+            results = await self.scheduler.call(self.sp.search, q=query, type='track', limit=limit, priority=INTERACTIVE)
+            return [
+                {
+                    'id': track['id'],
+                    'name': track['name'],
+                    'artists': [{'name': artist['name']} for artist in track.get('artists') or []],
+                    'popularity': track.get('popularity') or 0
+                }
+                for track in results['tracks']['items'] if track
+            ]
         except Exception as e:
-            logger.error(f"Error searching track: {str(e)}")
-            return None
+            logger.error(f"Error searching tracks: {str(e)}")
+            raise
+
+    async def create_playlist(self, name: str, track_ids: list[str]) -> dict:
+        """Create a new playlist and add tracks to it.
 
-    async def create_playlist(self, name: str, track_ids: list[str]) -> str:
-        """Create a new playlist and add tracks to it"""
+        Returns the playlist's `id`, `url` and the `snapshot_id` after the last change.
+        """
         try:
             # Get current user
-            user = self.sp.current_user()
+            user = await self.scheduler.call(self.sp.current_user)
             
             # Create playlist
-            playlist = self.sp.user_playlist_create(
+            playlist = await self.scheduler.call(
+                self.sp.user_playlist_create,
                 user=user['id'],
                 name=name,
                 public=True,
                 description="Generated by AI Playlist Generator"
             )
             
-            # Add tracks to playlist
-            self.sp.playlist_add_items(playlist['id'], track_ids)
+            # Add tracks to playlist, in order and within Spotify's per-call limit
+            snapshot_id = playlist.get('snapshot_id')
+            for chunk in chunked(track_ids):
+                result = await self.scheduler.call(self.sp.playlist_add_items, playlist['id'], chunk)
+                snapshot_id = result['snapshot_id']
             
-            return playlist['external_urls']['spotify']
+            return {'id': playlist['id'], 'url': playlist['external_urls']['spotify'], 'snapshot_id': snapshot_id}
         except Exception as e:
             logger.error(f"Error creating playlist: {str(e)}")
             raise
 
+    async def get_playlist_snapshot(self, playlist_id: str) -> Optional[str]:
+        """The playlist's current snapshot ID, or None if it no longer exists"""
+        from spotipy.exceptions import SpotifyException
+
+        try:
+            playlist = await self.scheduler.call(self.sp.playlist, playlist_id, fields='snapshot_id')
+            return playlist['snapshot_id']
+        except SpotifyException as e:
+            if e.http_status == 404:
+                return None
+            raise
+
+    async def rename_playlist(self, playlist_id: str, name: str):
+        await self.scheduler.call(self.sp.playlist_change_details, playlist_id, name=name)
+
+    async def update_playlist(self, playlist_id: str, diff: PlaylistDiff) -> Optional[str]:
+        """Apply a diff with chunked remove, reorder and add calls; returns the new snapshot ID"""
+        snapshot_id = None
+        for chunk in chunked(diff.removals):
+            result = await self.scheduler.call(self.sp.playlist_remove_all_occurrences_of_items, playlist_id, chunk)
+            snapshot_id = result['snapshot_id']
+        for range_start, insert_before, range_length in diff.moves:
+            result = await self.scheduler.call(
+                self.sp.playlist_reorder_items, playlist_id,
+                range_start=range_start, insert_before=insert_before, range_length=range_length
+            )
+            snapshot_id = result['snapshot_id']
+        for position, track_ids in diff.additions:
+            for start in range(0, len(track_ids), SPOTIFY_MAX_ITEMS):
+                result = await self.scheduler.call(
+                    self.sp.playlist_add_items, playlist_id,
+                    track_ids[start:start + SPOTIFY_MAX_ITEMS], position=position + start
+                )
+                snapshot_id = result['snapshot_id']
+        return snapshot_id
+
+    async def replace_playlist_tracks(self, playlist_id: str, track_ids: list[str]) -> str:
+        """Replace every track, for playlists that changed outside the app"""
+        chunks = chunked(track_ids) or [[]]
+        result = await self.scheduler.call(self.sp.playlist_replace_items, playlist_id, chunks[0])
+        for chunk in chunks[1:]:
+            result = await self.scheduler.call(self.sp.playlist_add_items, playlist_id, chunk)
+        return result['snapshot_id']
+
     def add_tracks_to_playlist(self, playlist_id, track_uris):
         """Add tracks to a playlist"""
         try:
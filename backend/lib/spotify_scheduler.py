@@ -0,0 +1,151 @@
+import os
+import time
+import heapq
+import random
+import asyncio
+import functools
+import itertools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from .metrics import SPOTIFY_CALL_DURATION, SPOTIFY_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+# Priority lanes, lower runs first
+INTERACTIVE = 0
+BACKGROUND = 1
+
+SPOTIFY_RATE_LIMIT = float(os.getenv('SPOTIFY_RATE_LIMIT', '10'))
+SPOTIFY_BURST = float(os.getenv('SPOTIFY_BURST', '20'))
+SPOTIFY_MAX_RETRIES = int(os.getenv('SPOTIFY_MAX_RETRIES', '4'))
+RETRY_BASE_DELAY = 0.5
+RETRY_MAX_DELAY = 30.0
+RETRYABLE_STATUSES = (500, 502, 503, 504)
+
+
+class SpotifyScheduler:
+    """Runs blocking spotipy calls under a shared token bucket.
+
+    Callers queue by priority lane, so interactive requests are dispatched
+    before queued background work. A 429 pauses the whole bucket for the
+    `Retry-After` period before the call is retried; 5xx responses are
+    retried with jittered exponential backoff.
+    """
+
+    def __init__(self, rate: float = SPOTIFY_RATE_LIMIT, burst: float = SPOTIFY_BURST,
+                 max_retries: int = SPOTIFY_MAX_RETRIES, max_workers: int = 16):
+        self.rate = rate
+        self.burst = burst
+        self.max_retries = max_retries
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._waiting = []
+        self._sequence = itertools.count()
+        self._condition = None
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='spotify')
+        self.calls = 0
+        self.retries = 0
+        self.rate_limited = 0
+
+    def _get_condition(self) -> asyncio.Condition:
+        # Created lazily so it binds to the running event loop
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    def _take_token(self) -> float:
+        """Take a token if one is available, else return seconds to wait"""
+        now = time.monotonic()
+        if now < self._paused_until:
+            return self._paused_until - now
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+    async def _acquire(self, priority: int):
+        condition = self._get_condition()
+        ticket = (priority, next(self._sequence))
+        async with condition:
+            heapq.heappush(self._waiting, ticket)
+            # A new head of the queue may have arrived, let the others re-check
+            condition.notify_all()
+            try:
+                while True:
+                    if self._waiting[0] == ticket:
+                        wait = self._take_token()
+                        if wait == 0:
+                            heapq.heappop(self._waiting)
+                            condition.notify_all()
+                            return
+                        try:
+                            await asyncio.wait_for(condition.wait(), timeout=wait)
+                        except asyncio.TimeoutError:
+                            pass
+                    else:
+                        await condition.wait()
+            except BaseException:
+                if ticket in self._waiting:
+                    self._waiting.remove(ticket)
+                    heapq.heapify(self._waiting)
+                    condition.notify_all()
+                raise
+
+    async def _pause(self, seconds: float):
+        async with self._get_condition():
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._get_condition().notify_all()
+
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter keeps retrying callers from moving in lockstep
+        return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+
+    async def call(self, func, *args, priority: int = INTERACTIVE, **kwargs):
+        """Run `func(*args, **kwargs)` in a worker thread once the rate limit allows"""
+        method = getattr(func, '__name__', repr(func))
+        with SPOTIFY_CALL_DURATION.time('spotify', method=method):
+            return await self._call(func, args, kwargs, priority, method)
+
+    async def _call(self, func, args, kwargs, priority: int, method: str):
+        from spotipy.exceptions import SpotifyException
+
+        loop = asyncio.get_running_loop()
+        for attempt in range(self.max_retries + 1):
+            await self._acquire(priority)
+            self.calls += 1
+            try:
+                result = await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+                SPOTIFY_REQUESTS.inc(method=method, status='200')
+                return result
+            except SpotifyException as e:
+                SPOTIFY_REQUESTS.inc(method=method, status=str(e.http_status))
+                if attempt == self.max_retries:
+                    raise
+                if e.http_status == 429:
+                    self.rate_limited += 1
+                    retry_after = (e.headers or {}).get('Retry-After')
+                    delay = float(retry_after) if retry_after else self._backoff(attempt)
+                    logger.warning(f"Spotify rate limit hit, pausing for {delay:.1f}s")
+                    await self._pause(delay)
+                    # Spread the retries out after the pause
+                    delay = random.uniform(0, RETRY_BASE_DELAY)
+                elif e.http_status in RETRYABLE_STATUSES:
+                    delay = self._backoff(attempt)
+                    logger.warning(f"Spotify returned {e.http_status}, retrying in {delay:.1f}s")
+                else:
+                    raise
+                self.retries += 1
+                await asyncio.sleep(delay)
+
+    def stats(self) -> dict:
+        return {
+            'calls': self.calls,
+            'retries': self.retries,
+            'rate_limited': self.rate_limited,
+            'queued': len(self._waiting),
+            'paused_for': max(0.0, self._paused_until - time.monotonic()),
+        }
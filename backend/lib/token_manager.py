@@ -1,15 +1,38 @@
 import json
 import os
+import time
+import asyncio
+import threading
 from pathlib import Path
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+TOKENS_DIR = os.getenv('SPOTIFY_TOKEN_DIR', '/app/tokens')
+# Refresh this many seconds before the access token expires
+TOKEN_REFRESH_MARGIN = int(os.getenv('SPOTIFY_TOKEN_REFRESH_MARGIN', '300'))
+# Spotify access tokens last one hour
+DEFAULT_EXPIRES_IN = 3600
+
 class TokenManager:
-    def __init__(self):
-        self.tokens_dir = Path("/app/tokens")
+    """Keeps the Spotify token in memory and refreshes it before it expires.
+
+    The token file is written on every new token and read again only when it
+    changed, so a token saved or refreshed by another worker process is
+    picked up on the next use. The manager also implements spotipy's auth manager interface, so a single
+    long-lived `spotipy.Spotify` always sends the current access token.
+    """
+
+    def __init__(self, auth_manager_factory=None, refresh_margin: int = TOKEN_REFRESH_MARGIN):
+        self.tokens_dir = Path(TOKENS_DIR)
         self.token_file = self.tokens_dir / "spotify_token.json"
+        self.auth_manager_factory = auth_manager_factory
+        self.refresh_margin = refresh_margin
+        self._token = None
+        # (mtime, inode) of the token file when it was last read or written
+        self._file_version = None
+        self._lock = threading.RLock()
         self._ensure_tokens_dir()
 
     def _ensure_tokens_dir(self):
@@ -19,46 +42,131 @@ class TokenManager:
             logger.info(f"Created tokens directory at {self.tokens_dir.absolute()}")
 
     def save_token(self, token_data: dict):
-        """Save token data to file"""
+        """Save token data to memory and file"""
         try:
             # Add timestamp for token expiration tracking
             token_data['timestamp'] = datetime.now().isoformat()
-            
-            with open(self.token_file, 'w') as f:
-                json.dump(token_data, f)
+            token_data.setdefault('expires_at', int(time.time()) + token_data.get('expires_in', DEFAULT_EXPIRES_IN))
+
+            with self._lock:
+                self._token = token_data
+                # Written to a temporary file and renamed, so other processes never read half a token
+                temp_file = self.token_file.with_suffix('.tmp')
+                with open(temp_file, 'w') as f:
+                    json.dump(token_data, f)
+                os.replace(temp_file, self.token_file)
+                self._file_version = self._stat_token_file()
             logger.info(f"Saved token to {self.token_file}")
         except Exception as e:
             logger.error(f"Error saving token: {str(e)}")
             raise
 
-    def get_token(self) -> dict:
-        """Get the current token, checking for expiration"""
+    def _stat_token_file(self):
         try:
-            if not self.token_file.exists():
-                logger.error(f"Token file not found at {self.token_file}")
-                return None
+            stat = self.token_file.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_ino
+
+    def _load_token(self):
+        """Read the token file if it changed since it was last read or written"""
+        file_version = self._stat_token_file()
+        if file_version == self._file_version:
+            return
+        try:
+            if file_version is None:
+                # Cleared by another process
+                logger.warning(f"Token file not found at {self.token_file}")
+                self._token = None
+                self._file_version = None
+                return
 
             with open(self.token_file, 'r') as f:
                 token_data = json.load(f)
 
-            # Check if token is expired (Spotify tokens typically expire in 1 hour)
-            if 'timestamp' in token_data:
-                token_time = datetime.fromisoformat(token_data['timestamp'])
-                if datetime.now() - token_time > timedelta(minutes=55):  # Refresh 5 minutes before expiry
-                    logger.info("Token is expired or about to expire")
-                    return None
+            # Files written before expires_at was tracked only have a timestamp
+            if 'expires_at' not in token_data and 'timestamp' in token_data:
+                token_time = datetime.fromisoformat(token_data['timestamp']).timestamp()
+                token_data['expires_at'] = int(token_time) + token_data.get('expires_in', DEFAULT_EXPIRES_IN)
+            self._token = token_data
+            self._file_version = file_version
+        except Exception as e:
+            logger.error(f"Error reading token: {str(e)}")
+
+    def seconds_until_refresh(self) -> float | None:
+        """Seconds until the token should be refreshed, None without a token"""
+        with self._lock:
+            self._load_token()
+            if not self._token:
+                return None
+            return self._token.get('expires_at', 0) - self.refresh_margin - time.time()
 
+    def refresh_token(self) -> dict | None:
+        """Exchange the stored refresh token for a new access token"""
+        with self._lock:
+            self._load_token()
+            if not self._token or not self._token.get('refresh_token') or not self.auth_manager_factory:
+                return None
+            logger.info("Refreshing Spotify access token")
+            token_data = self.auth_manager_factory().refresh_access_token(self._token['refresh_token'])
+            self.save_token(token_data)
             return token_data
+
+    def get_token(self) -> dict:
+        """Get the current token, refreshing it first if it is about to expire"""
+        try:
+            with self._lock:
+                until_refresh = self.seconds_until_refresh()
+                if until_refresh is None:
+                    return None
+                if until_refresh <= 0:
+                    logger.info("Token is expired or about to expire")
+                    try:
+                        self.refresh_token()
+                    except Exception as e:
+                        logger.error(f"Error refreshing token: {str(e)}")
+                    # A token that has not actually expired yet is still usable
+                    if self._token.get('expires_at', 0) <= time.time():
+                        return None
+                return self._token
         except Exception as e:
             logger.error(f"Error reading token: {str(e)}")
             return None
 
+    def get_access_token(self, as_dict: bool = False):
+        """spotipy auth manager interface"""
+        token_data = self.get_token()
+        if not token_data or 'access_token' not in token_data:
+            raise Exception("No token found")
+        return token_data if as_dict else token_data['access_token']
+
+    async def refresh_loop(self, idle_interval: float = 60):
+        """Refresh the token in the background shortly before it expires"""
+        while True:
+            until_refresh = self.seconds_until_refresh()
+            if until_refresh is None:
+                # No token yet; check again once the user has authorized
+                await asyncio.sleep(idle_interval)
+                continue
+            if until_refresh > 0:
+                await asyncio.sleep(min(until_refresh, idle_interval))
+                continue
+            try:
+                if await asyncio.to_thread(self.refresh_token) is None:
+                    await asyncio.sleep(idle_interval)
+            except Exception as e:
+                logger.error(f"Error refreshing token: {str(e)}")
+                await asyncio.sleep(idle_interval)
+
     def clear_token(self):
         """Clear the stored token"""
         try:
-            if self.token_file.exists():
-                self.token_file.unlink()
-                logger.info("Cleared token file")
+            with self._lock:
+                self._token = None
+                self._file_version = None
+                if self.token_file.exists():
+                    self.token_file.unlink()
+                    logger.info("Cleared token file")
         except Exception as e:
             logger.error(f"Error clearing token: {str(e)}")
-            raise 
\ No newline at end of file
+            raise
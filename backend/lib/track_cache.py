@@ -0,0 +1,110 @@
+import os
+import re
+import time
+import logging
+import unicodedata
+from typing import Dict, Iterable, Optional
+
+from .cache import LRUCache, MISSING, PurgeThrottle
+
+logger = logging.getLogger(__name__)
+
+# Found tracks rarely change ID; "not found" answers are retried much sooner
+TRACK_CACHE_TTL = float(os.getenv('TRACK_CACHE_TTL', str(30 * 24 * 3600)))
+TRACK_CACHE_NEGATIVE_TTL = float(os.getenv('TRACK_CACHE_NEGATIVE_TTL', str(24 * 3600)))
+TRACK_CACHE_MEMORY_SIZE = int(os.getenv('TRACK_CACHE_MEMORY_SIZE', '5000'))
+# Track lookups kept in the track_cache table
+TRACK_CACHE_MAX_ROWS = int(os.getenv('TRACK_CACHE_MAX_ROWS', '100000'))
+
+
+def normalize(value: str) -> str:
+    """Lowercase, strip accents and collapse whitespace"""
+    value = unicodedata.normalize('NFKD', value)
+    value = ''.join(c for c in value if not unicodedata.combining(c))
+    return re.sub(r'\s+', ' ', value).strip().casefold()
+
+
+def track_key(name: str, artist: str) -> str:
+    return f"{normalize(name)}\t{normalize(artist)}"
+
+
+class TrackCache:
+    """(track name, artist) -> Spotify track ID cache.
+
+    A hot in-process LRU sits in front of the `track_cache` table in SQLite.
+    A cached value of None means the track was searched and not found.
+    """
+
+    def __init__(self, db, maxsize: int = TRACK_CACHE_MEMORY_SIZE,
+                 ttl: float = TRACK_CACHE_TTL, negative_ttl: float = TRACK_CACHE_NEGATIVE_TTL,
+                 max_rows: int = TRACK_CACHE_MAX_ROWS):
+        self.db = db
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_rows = max_rows
+        self._purge = PurgeThrottle()
+        self.memory = LRUCache(maxsize=maxsize)
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+
+    def _ttl_for(self, track_id: Optional[str]) -> float:
+        return self.ttl if track_id else self.negative_ttl
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Optional[str]]:
+        """Return cached entries for the given keys; missing keys are left out"""
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        pending = []
+        for key in keys:
+            value = self.memory.get(key)
+            if value is MISSING:
+                pending.append(key)
+            else:
+                found[key] = value
+
+        if pending:
+            now = time.time()
+            for key, track_id, cached_at in self.db.get_cached_tracks(pending):
+                age = now - cached_at
+                if age < self._ttl_for(track_id):
+                    found[key] = track_id
+                    self.memory.set(key, track_id, ttl=self._ttl_for(track_id) - age)
+
+        for value in found.values():
+            if value:
+                self.hits += 1
+            else:
+                self.negative_hits += 1
+        self.misses += len(keys) - len(found)
+        return found
+
+    def set_many(self, entries: Dict[str, Optional[str]]):
+        """Store resolved IDs (or None for not found) in both tiers"""
+        if not entries:
+            return
+        for key, track_id in entries.items():
+            self.memory.set(key, track_id, ttl=self._ttl_for(track_id))
+        now = time.time()
+        self.db.cache_tracks(entries, now)
+        if self._purge.due(now):
+            self.db.purge_cached_tracks(now - self.ttl, now - self.negative_ttl, self.max_rows)
+
+    async def aget_many(self, keys: Iterable[str]) -> Dict[str, Optional[str]]:
+        """get_many off the event loop, on the database thread pool"""
+        return await self.db.run(self.get_many, list(keys))
+
+    async def aset_many(self, entries: Dict[str, Optional[str]]):
+        """set_many off the event loop, on the database thread pool"""
+        if entries:
+            await self.db.run(self.set_many, entries)
+
+    def stats(self) -> dict:
+        total = self.hits + self.negative_hits + self.misses
+        return {
+            'hits': self.hits,
+            'negative_hits': self.negative_hits,
+            'misses': self.misses,
+            'hit_rate': (self.hits + self.negative_hits) / total if total else 0.0,
+            'memory': self.memory.stats(),
+        }
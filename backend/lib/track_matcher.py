@@ -0,0 +1,91 @@
+import os
+import re
+from difflib import SequenceMatcher
+from typing import List, Optional, Tuple
+
+from .track_cache import normalize
+
+# A candidate needs at least this title and artist similarity (0-1) to count as a match
+MATCH_TITLE_THRESHOLD = float(os.getenv('MATCH_TITLE_THRESHOLD', '0.75'))
+MATCH_ARTIST_THRESHOLD = float(os.getenv('MATCH_ARTIST_THRESHOLD', '0.6'))
+# Weights of the title, artist and popularity parts of a candidate's score
+TITLE_WEIGHT = 0.6
+ARTIST_WEIGHT = 0.35
+POPULARITY_WEIGHT = 0.05
+
+# "(feat. X)", "[Live]", "(Remastered 2011)" and the like
+_BRACKETS_RE = re.compile(r'\s*[(\[][^)\]]*[)\]]')
+# " - Remastered 2011", " - Live at Wembley", " - Radio Edit"
+_SUFFIX_RE = re.compile(r'\s+-\s+.*\b(remaster(ed)?|live|edit|version|mix|mono|stereo|demo|acoustic)\b.*$', re.IGNORECASE)
+_FEATURING_RE = re.compile(r'\s+(feat\.|ft\.|featuring)\s+.*$', re.IGNORECASE)
+_NUMBER_RE = re.compile(r'\d+')
+# Separators between credited artists
+_ARTIST_SPLIT_RE = re.compile(r'\s*(?:,|&|\bfeat\.|\bft\.|\bfeaturing\b)\s*', re.IGNORECASE)
+
+
+def clean_title(name: str) -> str:
+    """Drop featuring credits, remaster/live suffixes and bracketed parts"""
+    cleaned = _SUFFIX_RE.sub('', _BRACKETS_RE.sub('', name))
+    cleaned = _FEATURING_RE.sub('', cleaned).strip()
+    return cleaned or name.strip()
+
+
+def main_artist(artist: str) -> str:
+    """The first credited artist of "A feat. B", "A & B" or "A, B" """
+    return _ARTIST_SPLIT_RE.split(artist.strip(), maxsplit=1)[0] or artist.strip()
+
+
+def similarity(a: str, b: str) -> float:
+    a, b = normalize(a), normalize(b)
+    if a == b:
+        return 1.0
+    return SequenceMatcher(None, a, b).ratio()
+
+
+def title_similarity(wanted: str, found: str) -> float:
+    # "Part 1" and "Part 2" are close as strings but different songs
+    if _NUMBER_RE.findall(clean_title(wanted)) != _NUMBER_RE.findall(clean_title(found)):
+        return 0.0
+    return max(similarity(wanted, found), similarity(clean_title(wanted), clean_title(found)))
+
+
+def artist_similarity(wanted: str, found_artists: List[str]) -> float:
+    """Best match of any credited artist against the wanted artist or its main artist"""
+    wanted_names = {wanted, main_artist(wanted)}
+    return max(
+        (similarity(name, found) for name in wanted_names for found in found_artists),
+        default=0.0
+    )
+
+
+def score_candidate(name: str, artist: str, candidate: dict) -> Optional[float]:
+    """Score a Spotify track for (name, artist), or None if it isn't a match"""
+    title_score = title_similarity(name, candidate['name'])
+    if title_score < MATCH_TITLE_THRESHOLD:
+        return None
+    artist_score = artist_similarity(artist, [found['name'] for found in candidate.get('artists') or []])
+    if artist_score < MATCH_ARTIST_THRESHOLD:
+        return None
+    popularity = (candidate.get('popularity') or 0) / 100
+    return TITLE_WEIGHT * title_score + ARTIST_WEIGHT * artist_score + POPULARITY_WEIGHT * popularity
+
+
+def best_match(name: str, artist: str, candidates: List[dict]) -> Optional[str]:
+    """ID of the best scoring candidate, or None if none of them matches"""
+    best_id, best_score = None, None
+    for candidate in candidates:
+        score = score_candidate(name, artist, candidate)
+        if score is not None and (best_score is None or score > best_score):
+            best_id, best_score = candidate['id'], score
+    return best_id
+
+
+def query_tiers(name: str, artist: str) -> List[Tuple[str, str]]:
+    """(tier, query) pairs from strictest to loosest; later ones are only tried on a miss"""
+    cleaned = clean_title(name)
+    artist_name = main_artist(artist)
+    tiers = [('strict', f"track:{name} artist:{artist}")]
+    if cleaned != name or artist_name != artist:
+        tiers.append(('cleaned', f"track:{cleaned} artist:{artist_name}"))
+    tiers.append(('free_text', f"{cleaned} {artist_name}"))
+    return tiers
@@ -0,0 +1,147 @@
+import asyncio
+import os
+import logging
+from collections import Counter, defaultdict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .track_cache import normalize, track_key
+from .track_matcher import best_match, main_artist, query_tiers
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONCURRENCY = int(os.getenv('SPOTIFY_SEARCH_CONCURRENCY', '8'))
+# Candidates fetched per track search and scored locally
+SEARCH_CANDIDATES = int(os.getenv('SPOTIFY_SEARCH_CANDIDATES', '5'))
+# Artists with at least this many tracks to resolve are first searched once for all of them
+ARTIST_GROUP_MIN_TRACKS = int(os.getenv('SPOTIFY_ARTIST_GROUP_MIN_TRACKS', '3'))
+# Spotify's largest search page
+ARTIST_SEARCH_CANDIDATES = 50
+
+
+class TrackResolver:
+    """Resolve (name, artist) pairs to Spotify track IDs concurrently.
+
+    Each search fetches several candidates, which are scored locally by title
+    and artist similarity and popularity. Tracks go through looser queries
+    only when the stricter ones find no match, and artists with several
+    tracks are searched once for all of them before that.
+    """
+
+    def __init__(self, spotify_client, cache=None, max_concurrency: int = DEFAULT_CONCURRENCY):
+        self.spotify_client = spotify_client
+        self.cache = cache
+        self.max_concurrency = max(1, max_concurrency)
+        self.searches = 0
+        self.found = Counter()
+        self.not_found = 0
+
+    async def resolve(self, tracks: List[Dict[str, str]],
+                      progress: Optional[Callable[[int, int], Awaitable[None]]] = None
+                      ) -> Tuple[List[Optional[str]], List[Dict[str, str]]]:
+        """Search every track with at most `max_concurrency` requests in flight.
+
+        Cached lookups are answered without a search and duplicate tracks are
+        searched once. Returns the track IDs, one entry per input track in the
+        same order with None for tracks that were not resolved, and the tracks
+        whose search failed even after the scheduler's retries. `progress` is
+        awaited with (tracks done, total tracks) as lookups complete.
+        """
+        keys = [track_key(track['name'], track['artist']) for track in tracks]
+        resolved = await self.cache.aget_many(keys) if self.cache else {}
+
+        pending = {}
+        for key, track in zip(keys, tracks):
+            if key not in resolved and key not in pending:
+                pending[key] = track
+
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        occurrences = Counter(keys)
+        done = len(tracks) - sum(occurrences[key] for key in pending)
+        searches = 0
+        if progress:
+            await progress(done, len(tracks))
+
+        async def search(query: str, limit: int) -> List[dict]:
+            nonlocal searches
+            async with semaphore:
+                searches += 1
+                self.searches += 1
+                return await self.spotify_client.search_tracks(query, limit=limit)
+
+        async def finish(key: str):
+            nonlocal done
+            done += occurrences[key]
+            if progress:
+                await progress(done, len(tracks))
+
+        searched = {}
+
+        async def resolve_artist(group: List[str]):
+            artist = main_artist(pending[group[0]]['artist'])
+            try:
+                candidates = await search(f"artist:{artist}", ARTIST_SEARCH_CANDIDATES)
+            except Exception as e:
+                # The tracks are still searched one by one
+                logger.warning(f"Artist search failed for {artist}: {e}")
+                return
+            for key in group:
+                track_id = best_match(pending[key]['name'], pending[key]['artist'], candidates)
+                if track_id:
+                    searched[key] = track_id
+                    self.found['artist'] += 1
+                    await finish(key)
+
+        groups = defaultdict(list)
+        for key, track in pending.items():
+            groups[normalize(main_artist(track['artist']))].append(key)
+        await asyncio.gather(*(
+            resolve_artist(group) for group in groups.values() if len(group) >= ARTIST_GROUP_MIN_TRACKS
+        ))
+
+        async def resolve_one(key: str, track: Dict[str, str]) -> Optional[str]:
+            try:
+                for tier, query in query_tiers(track['name'], track['artist']):
+                    track_id = best_match(track['name'], track['artist'], await search(query, SEARCH_CANDIDATES))
+                    if track_id:
+                        self.found[tier] += 1
+                        return track_id
+                self.not_found += 1
+                return None
+            finally:
+                await finish(key)
+
+        remaining = [key for key in pending if key not in searched]
+        results = await asyncio.gather(
+            *(resolve_one(key, pending[key]) for key in remaining),
+            return_exceptions=True
+        )
+
+        failed = []
+        for key, result in zip(remaining, results):
+            if isinstance(result, Exception):
+                # Don't cache failures, only definite answers
+                logger.warning(f"Search failed for {pending[key]['name']} by {pending[key]['artist']}: {result}")
+                failed.append(pending[key])
+                resolved[key] = None
+            else:
+                searched[key] = result
+        resolved.update(searched)
+        if self.cache:
+            await self.cache.aset_many(searched)
+
+        track_ids = [resolved[key] for key in keys]
+        logger.info(
+            f"Resolved {sum(1 for t in track_ids if t)}/{len(tracks)} tracks "
+            f"({searches} searches for {len(pending)} tracks, {len(tracks) - len(pending)} from cache or duplicates)"
+        )
+        return track_ids, failed
+
+    def stats(self) -> dict:
+        resolved = sum(self.found.values())
+        return {
+            'searches': self.searches,
+            'resolved': resolved,
+            'not_found': self.not_found,
+            'resolved_by_tier': dict(self.found),
+            'searches_per_resolved': round(self.searches / resolved, 2) if resolved else None
+        }
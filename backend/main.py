@@ -1,15 +1,51 @@
-from fastapi import FastAPI, HTTPException, Request
+import time
+
+# Measured from here, so startup time includes the imports below
+IMPORT_STARTED = time.perf_counter()
+
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from lib.database import Database
-from lib.spotify_client import SpotifyClient
+from lib.spotify_client import SpotifyClient, TIME_RANGES
+from lib.jobs import JobManager
+from lib import metrics
+from lib.logging_config import setup_logging
 from lib.openai_client import OpenAIClient
-from typing import List, Optional, Dict
-from pydantic import BaseModel
+from lib.favorites import FavoritesSelector
+from lib.playlist_cache import PlaylistCache
+from lib.playlist_diff import diff_playlist
+from lib.response_cache import ResponseCache
+from lib.services import Services
+from lib.track_cache import TrackCache
+from lib.track_resolver import TrackResolver
+from typing import List, Literal, Optional, Dict
+from contextlib import asynccontextmanager
+from pydantic import BaseModel, Field
+import os
+import json
+import uuid
+import asyncio
 import logging
 
+setup_logging()
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+# Services built and warmed up before the app reports ready, e.g. "db,job_manager,similarity_engine"
+SERVICE_WARMUP = os.getenv('SERVICE_WARMUP', 'job_manager')
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Failures are logged and shown by /health/ready; the other services still work
+    app.state.warmup_errors = await services.warm_up(
+        name.strip() for name in SERVICE_WARMUP.split(',') if name.strip()
+    )
+    app.state.startup_seconds = time.perf_counter() - IMPORT_STARTED
+    logger.info(f"Ready {app.state.startup_seconds:.2f}s after import")
+    yield
+    await services.close()
+
+app = FastAPI(lifespan=lifespan)
 
 # Configure CORS
 app.add_middleware(
@@ -18,12 +54,61 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
-# Initialize services
-db = Database()
-spotify_client = SpotifyClient()
-openai_client = OpenAIClient()
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    timings = metrics.start_request_timings()
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        if metrics.METRICS_TIMING_HEADERS:
+            response.headers["Server-Timing"] = metrics.server_timing_header(timings, time.perf_counter() - start)
+        return response
+    finally:
+        # Label by route template so IDs in paths do not create new series
+        route = request.scope.get("route")
+        metrics.HTTP_REQUEST_DURATION.observe(
+            time.perf_counter() - start,
+            method=request.method,
+            route=route.path if route is not None else "unmatched",
+            status=status
+        )
+
+# Services are built on first use (or at startup when listed in SERVICE_WARMUP)
+services = Services()
+
+def build_job_manager(services: Services) -> JobManager:
+    job_manager = JobManager(services.db)
+    job_manager.register('sync', run_sync_job)
+    job_manager.register('upload', run_upload_job)
+    return job_manager
+
+def build_similarity_engine(services: Services):
+    # Imported here so numpy loads with the engine, not with the app
+    from lib.similarity import SimilarityEngine
+    return SimilarityEngine(services.db)
+
+services.register('db', lambda services: Database(),
+                  warm_up=lambda db: db.run(db.get_catalog_version), close=lambda db: db.close())
+services.register('spotify_client', lambda services: SpotifyClient(),
+                  start=lambda client: asyncio.create_task(client.token_manager.refresh_loop()))
+services.register('playlist_cache', lambda services: PlaylistCache(
+    services.db if os.getenv('PLAYLIST_CACHE_PERSIST', '1') == '1' else None
+))
+services.register('openai_client', lambda services: OpenAIClient(cache=services.playlist_cache),
+                  close=lambda client: client.close())
+services.register('track_cache', lambda services: TrackCache(services.db))
+services.register('track_resolver', lambda services: TrackResolver(services.spotify_client, cache=services.track_cache))
+services.register('job_manager', build_job_manager,
+                  warm_up=lambda job_manager: job_manager.start(), close=lambda job_manager: job_manager.stop())
+services.register('similarity_engine', build_similarity_engine,
+                  warm_up=lambda engine: engine.db.run(engine.warm_up))
+services.register('favorites_selector', lambda services: FavoritesSelector(services.db))
+services.register('artist_responses', lambda services: ResponseCache())
 
 class Artist(BaseModel):
     id: str
@@ -31,10 +116,21 @@ class Artist(BaseModel):
     popularity: int
     status: str
     images: List[dict]
+    thumbnail: Optional[str] = None
+    time_ranges: List[str] = []
+    genres: List[str] = []
+    related: List[str] = []
 
 class StatusUpdate(BaseModel):
     status: str
 
+class ArtistStatusChange(BaseModel):
+    id: str
+    status: str
+
+class BulkStatusUpdate(BaseModel):
+    changes: List[ArtistStatusChange] = Field(min_length=1, max_length=1000)
+
 class PlaylistRequest(BaseModel):
     request: str
 
@@ -45,123 +141,474 @@ class GenerateRequest(BaseModel):
     request: str
     track_count: int = 10
     consider_favorites: bool = False
+    use_cache: bool = True
+    # "local" builds the playlist from the similarity engine without calling the LLM
+    mode: Literal['llm', 'local'] = 'llm'
     
 
+# Most playlists generated at once for one batch request
+PLAYLIST_BATCH_CONCURRENCY = int(os.getenv('PLAYLIST_BATCH_CONCURRENCY', '5'))
+PLAYLIST_BATCH_MAX_REQUESTS = 20
+
+class BatchGenerateRequest(BaseModel):
+    requests: List[GenerateRequest] = Field(min_length=1, max_length=PLAYLIST_BATCH_MAX_REQUESTS)
+
 class UploadRequest(BaseModel):
     tracks: List[Dict[str, str]]
     name: str
+    # A previously uploaded playlist to update instead of creating a new one
+    playlist_id: Optional[str] = None
 
 @app.get("/api/spotify/auth-url")
 async def get_spotify_auth_url():
     try:
-        auth_url = spotify_client.get_auth_url()
+        auth_url = services.spotify_client.get_auth_url()
         return {"auth_url": auth_url}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/spotify/callback")
 async def spotify_callback(code: str):
-    logger.info(f"CALLBACK")
     try:
         # Get access token
-        logger.info(f"getting access token")
-        access_token = spotify_client.get_access_token(code)
-        logger.info(f"access_token: {access_token}")
+        services.spotify_client.get_access_token(code)
+        logger.info("Spotify authorization completed")
         return {"message": "Token loaded successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/api/spotify/sync")
-async def sync_artists():
-    #try:
-    existing_artists = db.get_artists()
-    logger.info(existing_artists)
-    existing_artist_ids = {artist['id'] for artist in existing_artists['artists']}
+async def run_sync_job(params: dict, progress) -> dict:
+    steps = 3 if params.get('include_related') else 2
+    await progress(0, steps, "Fetching top artists")
+    # Get top artists for all requested time ranges concurrently
+    artists_data = await services.spotify_client.get_top_artists(time_ranges=params['time_ranges'])
+    if 'error' in artists_data:
+        raise Exception(artists_data['error'])
 
+    artists = [{
+        'id': artist['id'],
+        'name': artist['name'],
+        'popularity': artist['popularity'],
+        'images': artist['images'],
+        'time_ranges': artist['time_ranges'],
+        'genres': artist.get('genres', [])
+    } for artist in artists_data['items']]
 
-    # Get top artists
-    artists_data = spotify_client.get_top_artists()
-    if 'error' in artists_data:
-        raise HTTPException(status_code=400, detail=artists_data['error'])
+    if params.get('include_related'):
+        await progress(1, steps, f"Fetching related artists for {len(artists)} artists")
+        related = await services.spotify_client.get_related_artists([artist['id'] for artist in artists])
+        for artist in artists:
+            if artist['id'] in related:
+                artist['related'] = related[artist['id']]
 
+    await progress(steps - 1, steps, f"Saving {len(artists)} artists")
+    # Insert new artists and refresh existing ones, keeping their status
+    counts = await services.db.run(services.db.upsert_artists, artists)
+    # An engine that isn't built yet loads the new artists when it is
+    engine = services.built('similarity_engine')
+    if engine is not None:
+        engine.invalidate()
 
+    message = (
+        f"Sync completed: {counts['inserted']} new artists added, "
+        f"{counts['updated']} updated, {counts['unchanged']} unchanged"
+    )
+    await progress(steps, steps, message)
+    return {"message": message, **counts}
 
-    # Add only new artists
-    new_artists_count = 0
-    for artist in artists_data['items']:
-        if artist['id'] not in existing_artist_ids:
-            db.add_artist({
-                'id': artist['id'],
-                'name': artist['name'],
-                'popularity': artist['popularity'],
-                'images': artist['images']
-            })
-            new_artists_count += 1
-            logger.info(f"Added new artist: {artist['name']}")
+def job_accepted(job: dict) -> JSONResponse:
+    return JSONResponse(
+        status_code=202,
+        content={"job_id": job['id'], "status": job['status'], "status_url": f"/api/jobs/{job['id']}"}
+    )
 
-    return {
-        "message": f"Sync completed: {new_artists_count} new artists added, {len(existing_artists)} existing artists preserved"
-    }
-    #except Exception as e:
-    #    raise HTTPException(status_code=500, detail=str(e))
+@app.post("/api/spotify/sync", status_code=202)
+async def sync_artists(time_ranges: List[str] = Query(['long_term']), include_related: bool = False):
+    invalid = [r for r in time_ranges if r not in TIME_RANGES]
+    if invalid:
+        raise HTTPException(status_code=400, detail=f"Invalid time range(s): {', '.join(invalid)}")
+    job = await services.job_manager.submit('sync', {'time_ranges': time_ranges, 'include_related': include_related})
+    return job_accepted(job)
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = await services.job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+FIELDS_QUERY = Query(None, description="Comma-separated artist fields to return")
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    return [field.strip() for field in fields.split(',') if field.strip()] if fields else None
 
 @app.get("/api/artists")
 async def get_artists(
+    request: Request,
     status: Optional[str] = None,
-    page: int = 1,
-    page_size: int = 1000
+    page_size: int = Query(1000, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    include_total: bool = False,
+    fields: Optional[str] = FIELDS_QUERY
 ):
+    """Artist page, cached per catalog version and revalidated with ETags"""
+    params = {
+        'status': status,
+        'page_size': page_size,
+        'cursor': cursor,
+        'include_total': include_total,
+        'fields': parse_fields(fields),
+    }
     try:
-        result = db.get_artists(status=status, page=page, page_size=page_size)
-        return result
+        version = await services.db.run(services.db.get_catalog_version)
+        return await services.artist_responses.respond(
+            request, version, params, lambda: services.db.run(services.db.get_artists, **params)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.put("/api/artists/{artist_id}/status")
 async def update_artist_status(artist_id: str, status_update: StatusUpdate):
     try:
-        db.update_artist_status(artist_id, status_update.status)
-        return {"message": "Status updated successfully"}
+        version = await services.db.run(services.db.update_artist_status, artist_id, status_update.status)
+        return {"message": "Status updated successfully", "version": version}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.patch("/api/artists/status")
+async def update_artist_statuses(update: BulkStatusUpdate, fields: Optional[str] = FIELDS_QUERY):
+    """Apply many status changes in one transaction; returns only the changed artists"""
+    try:
+        # The last change for an artist wins
+        changes = {change.id: change.status for change in update.changes}
+        return await services.db.run(services.db.update_artist_statuses, changes, fields=parse_fields(fields))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/artists/changes")
+async def get_artist_changes(since: int = Query(..., ge=0), fields: Optional[str] = FIELDS_QUERY):
+    """Artists changed after catalog version `since`; reload everything when `reset` is true"""
+    try:
+        return await services.db.run(services.db.get_changes_since, since, fields=parse_fields(fields))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/recommendations/artists")
+async def recommend_artists(
+    k: int = Query(10, ge=1, le=100),
+    seed: Optional[List[str]] = Query(None, description="Artist IDs to find similar artists for; defaults to liked artists")
+):
+    """Similar artists from the local similarity engine, with their cosine scores"""
+    if seed:
+        matches = await services.db.run(services.similarity_engine.similar_to, seed, k)
+    else:
+        matches = await services.db.run(services.similarity_engine.recommend, k)
+    return {
+        "artists": [
+            {
+                "id": artist['id'],
+                "name": artist['name'],
+                "thumbnail": artist['thumbnail'],
+                "genres": artist['genres'],
+                "score": score
+            }
+            for artist, score in matches
+        ]
+    }
+
+# Top tracks taken from each recommended artist in local mode
+LOCAL_TRACKS_PER_ARTIST = 3
+
+async def generate_local_playlist(request: GenerateRequest) -> dict:
+    """Build a playlist from similar artists' top tracks, without the LLM.
+
+    With favorites the artists are the closest to the liked ones, otherwise
+    those whose genres match the request text.
+    """
+    artist_count = -(-request.track_count // LOCAL_TRACKS_PER_ARTIST)
+    if request.consider_favorites:
+        matches = await services.db.run(services.similarity_engine.recommend, artist_count)
+    else:
+        matches = await services.db.run(services.similarity_engine.search, request.request, artist_count)
+    if not matches:
+        raise ValueError("No similar artists found, sync your artists with related artists first")
+
+    top_tracks = await asyncio.gather(*(
+        services.spotify_client.get_artist_top_tracks(artist['id']) for artist, _ in matches
+    ), return_exceptions=True)
+    # Interleave artists so the best matches come first
+    per_artist = [tracks[:LOCAL_TRACKS_PER_ARTIST] for tracks in top_tracks if not isinstance(tracks, Exception)]
+    tracks = [
+        artist_tracks[position]
+        for position in range(LOCAL_TRACKS_PER_ARTIST)
+        for artist_tracks in per_artist
+        if position < len(artist_tracks)
+    ][:request.track_count]
+    if not tracks:
+        raise ValueError("Could not get top tracks for the recommended artists")
+    return {"name": request.request[:50], "tracks": tracks}
+
+async def load_liked_artist_names(request: str, consider_favorites: bool) -> Optional[List[str]]:
+    """The liked artists most relevant to the request, within the prompt token budget"""
+    if not consider_favorites:
+        return None
+    liked_artists_names = await services.db.run(services.favorites_selector.select, request)
+    logger.debug(f"Liked artists: {liked_artists_names}")
+    return liked_artists_names
+
+async def generate_one(request: GenerateRequest, liked_artists: Optional[List[dict]] = None) -> dict:
+    """Generate one playlist; favorites are ranked against `liked_artists` when it is given"""
+    if request.mode == 'local':
+        return await generate_local_playlist(request)
+
+    if liked_artists is not None and request.consider_favorites:
+        liked_artists_names = services.favorites_selector.select(request.request, liked_artists)
+    else:
+        liked_artists_names = await load_liked_artist_names(request.request, request.consider_favorites)
+    return await services.openai_client.generate_playlist(
+        request.request,
+        request.track_count,
+        liked_artists_names,
+        use_cache=request.use_cache
+    )
+
 @app.post("/api/playlist/generate")
 async def generate_playlist(request: GenerateRequest):
     try:
-        if request.consider_favorites:
-            liked_artists = db.get_artists(status="like")
-            liked_artists_names = [artist['name'] for artist in liked_artists['artists']]
-            logger.info(f"Liked artists: {liked_artists_names}")
-        else:
-            liked_artists_names = None
-            
-        tracks = openai_client.generate_playlist(request.request, request.track_count, liked_artists_names)
-        return {"tracks": tracks}
+        return {"tracks": await generate_one(request)}
     except Exception as e:
         logger.error(f"Error generating playlist: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/api/playlist/upload")
-async def upload_to_spotify(request: UploadRequest):
+async def start_batch(requests: List[GenerateRequest]) -> List[asyncio.Task]:
+    """Start generating every playlist, at most PLAYLIST_BATCH_CONCURRENCY at a time.
+
+    Liked artists are read once and shared by all requests. Each task
+    resolves to {"index", "tracks"} or {"index", "error"}.
+    """
+    liked_artists = None
+    if any(request.consider_favorites and request.mode == 'llm' for request in requests):
+        liked_artists = await services.db.run(services.favorites_selector.load)
+    semaphore = asyncio.Semaphore(PLAYLIST_BATCH_CONCURRENCY)
+
+    async def run(index: int, request: GenerateRequest) -> dict:
+        async with semaphore:
+            try:
+                return {"index": index, "tracks": await generate_one(request, liked_artists)}
+            except Exception as e:
+                logger.error(f"Error generating playlist {index} of batch: {str(e)}")
+                return {"index": index, "error": str(e)}
+
+    return [asyncio.create_task(run(index, request)) for index, request in enumerate(requests)]
+
+@app.post("/api/playlist/generate/batch")
+async def generate_playlist_batch(batch: BatchGenerateRequest):
+    """Generate several playlists concurrently; results are in request order"""
+    tasks = await start_batch(batch.requests)
+    try:
+        return {"results": await asyncio.gather(*tasks)}
+    finally:
+        for task in tasks:
+            task.cancel()
+
+@app.post("/api/playlist/generate/batch/stream")
+async def stream_playlist_batch(batch: BatchGenerateRequest):
+    """Server-sent events: one `result` per playlist as soon as it is ready, then `done`"""
+    tasks = await start_batch(batch.requests)
+
+    async def events():
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                result = await next_result
+                yield f"event: result\ndata: {json.dumps(result)}\n\n"
+            yield f"event: done\ndata: {json.dumps({'count': len(tasks)})}\n\n"
+        finally:
+            # Stop outstanding completions if the client goes away
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def local_playlist_events(request: GenerateRequest):
+    """The local playlist as the same events the LLM stream emits"""
     try:
-        # Search for each track and collect their Spotify IDs
-        track_ids = []
-        for track in request.tracks:
-            track_id = await spotify_client.search_track(track['name'], track['artist'])
-            if track_id:
-                track_ids.append(track_id)
-            else:
-                logger.warning(f"Could not find track: {track['name']} by {track['artist']}")
-
-        if not track_ids:
-            raise HTTPException(status_code=404, detail="No tracks found on Spotify")
+        playlist = await generate_local_playlist(request)
+    except Exception as e:
+        yield 'error', str(e)
+        return
+    yield 'name', playlist['name']
+    for track in playlist['tracks']:
+        yield 'track', track
+    yield 'done', playlist
+
+@app.post("/api/playlist/generate/stream")
+async def stream_playlist(request: GenerateRequest):
+    """Server-sent events: `name`, one `track` per track, then `done` or `error`"""
+    if request.mode == 'local':
+        playlist_events = local_playlist_events(request)
+    else:
+        liked_artists_names = await load_liked_artist_names(request.request, request.consider_favorites)
+        playlist_events = services.openai_client.stream_playlist(
+            request.request,
+            request.track_count,
+            liked_artists_names,
+            use_cache=request.use_cache
+        )
+
+    async def events():
+        async for event, data in playlist_events:
+            yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+    # X-Accel-Buffering stops nginx from holding events back
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def run_upload_job(params: dict, progress) -> dict:
+    tracks = params['tracks']
+
+    async def search_progress(done: int, total: int):
+        await progress(done, total, f"Resolved {done}/{total} tracks")
+
+    # Search all tracks concurrently and collect their Spotify IDs in order
+    resolved, failed = await services.track_resolver.resolve(tracks, progress=search_progress)
+    # Each track is kept once, at its first position, so playlists can be diffed by ID
+    resolved_tracks = {}
+    not_found = []
+    for track, track_id in zip(tracks, resolved):
+        if track_id:
+            resolved_tracks.setdefault(track_id, {'track_id': track_id, 'name': track['name'], 'artist': track['artist']})
+        elif track not in failed:
+            not_found.append(track)
+            logger.warning(f"Could not find track: {track['name']} by {track['artist']}")
+    track_ids = list(resolved_tracks)
+
+    if not track_ids:
+        if failed:
+            raise Exception("Spotify search failed, please retry")
+        raise Exception("No tracks found on Spotify")
+
+    stored = await services.db.run(services.db.get_playlist, params['playlist_id']) if params.get('playlist_id') else None
+    snapshot_id = None
+    if stored and stored['spotify_id']:
+        snapshot_id = await services.spotify_client.get_playlist_snapshot(stored['spotify_id'])
 
+    if snapshot_id is None:
         # Create playlist and add tracks
-        playlist_url = await spotify_client.create_playlist(request.name, track_ids)
-        return {"playlist_url": playlist_url}
+        await progress(len(tracks), len(tracks), "Creating playlist")
+        playlist = await services.spotify_client.create_playlist(params['name'], track_ids)
+        spotify_id, url, snapshot_id = playlist['id'], playlist['url'], playlist['snapshot_id']
+        changes = {'added': len(track_ids)}
+    else:
+        spotify_id, url = stored['spotify_id'], stored['url']
+        await progress(len(tracks), len(tracks), "Updating playlist")
+        if snapshot_id == stored['snapshot_id']:
+            diff = diff_playlist([track['track_id'] for track in stored['tracks']], track_ids)
+            snapshot_id = await services.spotify_client.update_playlist(spotify_id, diff) or snapshot_id
+            changes = diff.summary()
+        else:
+            # Edited on Spotify since the last upload, so the stored tracks can't be diffed against
+            logger.info(f"Playlist {spotify_id} changed on Spotify, replacing its tracks")
+            snapshot_id = await services.spotify_client.replace_playlist_tracks(spotify_id, track_ids)
+            changes = {'replaced': len(track_ids)}
+        if params['name'] != stored['name']:
+            await services.spotify_client.rename_playlist(spotify_id, params['name'])
+            snapshot_id = await services.spotify_client.get_playlist_snapshot(spotify_id)
+
+    playlist_id = stored['id'] if stored else uuid.uuid4().hex
+    await services.db.run(
+        services.db.save_playlist, playlist_id, params['name'], list(resolved_tracks.values()),
+        spotify_id=spotify_id, url=url, snapshot_id=snapshot_id
+    )
+    return {
+        "playlist_id": playlist_id,
+        "playlist_url": url,
+        "changes": changes,
+        "not_found": not_found,
+        "failed": failed
+    }
+
+@app.post("/api/playlist/upload", status_code=202)
+async def upload_to_spotify(request: UploadRequest):
+    if request.playlist_id and not await services.db.run(services.db.get_playlist, request.playlist_id):
+        raise HTTPException(status_code=404, detail="Playlist not found")
+    job = await services.job_manager.submit('upload', {
+        'name': request.name,
+        'tracks': request.tracks,
+        'playlist_id': request.playlist_id
+    })
+    return job_accepted(job)
+
+@app.get("/api/playlists")
+async def get_playlists():
+    return {"playlists": await services.db.run(services.db.get_playlists)}
+
+@app.get("/api/playlists/{playlist_id}")
+async def get_playlist(playlist_id: str):
+    playlist = await services.db.run(services.db.get_playlist, playlist_id)
+    if not playlist:
+        raise HTTPException(status_code=404, detail="Playlist not found")
+    return playlist
+
+@app.get("/api/cache/tracks")
+async def get_track_cache_stats():
+    return {**services.track_cache.stats(), 'resolver': services.track_resolver.stats()}
+
+@app.get("/api/spotify/scheduler")
+async def get_spotify_scheduler_stats():
+    return services.spotify_client.scheduler.stats()
+
+@app.get("/api/recommendations/stats")
+async def get_similarity_stats():
+    return services.similarity_engine.stats()
+
+@app.get("/api/cache/artists")
+async def get_artist_response_cache_stats():
+    return services.artist_responses.stats()
+
+@app.get("/api/cache/playlists")
+async def get_playlist_cache_stats():
+    return {**services.playlist_cache.stats(), 'single_flight': services.openai_client.inflight.stats()}
+
+@app.get("/health/live")
+async def liveness():
+    """The process is serving requests; touches no services"""
+    return {"status": "ok"}
+
+@app.get("/health/ready")
+async def readiness():
+    """Ready once startup has finished and the database answers"""
+    ready = hasattr(app.state, "startup_seconds")
+    error = None
+    try:
+        await services.db.run(services.db.get_catalog_version)
     except Exception as e:
-        logger.error(f"Error uploading to Spotify: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+        ready = False
+        error = str(e)
+    return JSONResponse(status_code=200 if ready else 503, content={
+        "status": "ready" if ready else "not_ready",
+        "error": error,
+        "startup_seconds": getattr(app.state, "startup_seconds", None),
+        "warmup_errors": getattr(app.state, "warmup_errors", {}),
+        "services": services.status()
+    })
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
 
 if __name__ == "__main__":
     import uvicorn
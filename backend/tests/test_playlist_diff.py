@@ -0,0 +1,93 @@
+import random
+
+import pytest
+
+from lib.playlist_diff import SPOTIFY_MAX_ITEMS, chunked, diff_playlist
+
+
+def apply_diff(playlist, diff):
+    """Replay a diff with the semantics of Spotify's remove, reorder and add calls"""
+    removed = set(diff.removals)
+    items = [track_id for track_id in playlist if track_id not in removed]
+    for range_start, insert_before, range_length in diff.moves:
+        block = items[range_start:range_start + range_length]
+        assert len(block) == range_length
+        rest = items[:range_start] + items[range_start + range_length:]
+        # insert_before is a position in the playlist before the range was taken out
+        destination = insert_before - range_length if insert_before > range_start else insert_before
+        items = rest[:destination] + block + rest[destination:]
+    for position, track_ids in diff.additions:
+        assert position <= len(items)
+        items[position:position] = track_ids
+    return items
+
+
+def ids(count, prefix='t'):
+    return [f'{prefix}{index}' for index in range(count)]
+
+
+def test_identical_playlists_need_no_calls():
+    diff = diff_playlist(ids(10), ids(10))
+    assert not diff
+    assert diff.api_calls == 0
+    assert diff.summary() == {'removed': 0, 'moved': 0, 'added': 0, 'api_calls': 0}
+
+
+@pytest.mark.parametrize('old, new', [
+    ([], ids(3)),
+    (ids(3), []),
+    (ids(5), list(reversed(ids(5)))),
+    (ids(5), ids(5)[1:] + ids(5)[:1]),
+    (ids(5), ids(5)[-1:] + ids(5)[:-1]),
+    (ids(6), ['t0', 'x0', 't2', 'x1', 't5', 't4']),
+])
+def test_diff_turns_old_into_new(old, new):
+    assert apply_diff(old, diff_playlist(old, new)) == new
+
+
+def test_moving_one_track_is_one_call():
+    old = ids(50)
+    new = old[:10] + old[11:40] + [old[10]] + old[40:]
+    diff = diff_playlist(old, new)
+    assert diff.moves and len(diff.moves) == 1
+    assert diff.api_calls == 1
+
+
+def test_neighbouring_tracks_move_together():
+    old = ids(20)
+    new = old[5:15] + old[:5] + old[15:]
+    diff = diff_playlist(old, new)
+    assert len(diff.moves) == 1
+    assert apply_diff(old, diff) == new
+
+
+def test_additions_are_grouped_into_runs_and_chunked():
+    old = ids(10)
+    new = old[:5] + ids(SPOTIFY_MAX_ITEMS + 1, 'x') + old[5:]
+    diff = diff_playlist(old, new)
+    assert len(diff.additions) == 1
+    assert diff.api_calls == 2
+    assert diff.summary()['added'] == SPOTIFY_MAX_ITEMS + 1
+
+
+def test_removals_are_chunked():
+    diff = diff_playlist(ids(250), ids(10))
+    assert diff.summary()['removed'] == 240
+    assert diff.api_calls == len(chunked(diff.removals)) == 3
+
+
+def test_random_edits():
+    rng = random.Random(42)
+    pool = ids(80)
+    for _ in range(2000):
+        old = rng.sample(pool, rng.randint(0, 40))
+        new = rng.sample(pool, rng.randint(0, 40))
+        if rng.random() < 0.5:
+            # Mostly the same tracks with a few changes, as when a playlist is edited
+            new = old[:]
+            for _ in range(rng.randint(1, 4)):
+                if new:
+                    new.insert(rng.randrange(len(new) + 1), new.pop(rng.randrange(len(new))))
+            new = [track_id for track_id in new if rng.random() > 0.1]
+            new += [track_id for track_id in rng.sample(pool, 3) if track_id not in new]
+        assert apply_diff(old, diff_playlist(old, new)) == new
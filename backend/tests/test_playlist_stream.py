@@ -0,0 +1,75 @@
+import json
+import random
+
+from lib.playlist_stream import PlaylistStreamParser
+
+PLAYLIST = {
+    'name': 'Rainy "Sunday" {mix}',
+    'tracks': [
+        {'name': 'Riders on the Storm', 'artist': 'The Doors'},
+        {'name': 'Set Fire to the Rain', 'artist': 'Adele', 'extra': {'name': 'nested'}},
+        {'name': 'Why Does It Always Rain on Me?', 'artist': 'Travis'},
+        {'name': 'Back\\slash } [bracket]', 'artist': 'Band, "Quoted"'},
+    ]
+}
+
+
+def feed_all(chunks):
+    parser = PlaylistStreamParser()
+    events = []
+    for chunk in chunks:
+        events.extend(parser.feed(chunk))
+    return events
+
+
+def expected_events(playlist):
+    return [('name', playlist['name'])] + [('track', track) for track in playlist['tracks']]
+
+
+def test_whole_document():
+    assert feed_all([json.dumps(PLAYLIST)]) == expected_events(PLAYLIST)
+
+
+def test_one_character_at_a_time():
+    assert feed_all(list(json.dumps(PLAYLIST, indent=2))) == expected_events(PLAYLIST)
+
+
+def test_random_chunking():
+    rng = random.Random(7)
+    text = json.dumps(PLAYLIST)
+    for _ in range(500):
+        cuts = sorted(rng.sample(range(1, len(text)), rng.randint(1, 20)))
+        chunks = [text[start:end] for start, end in zip([0] + cuts, cuts + [len(text)])]
+        assert feed_all(chunks) == expected_events(PLAYLIST)
+
+
+def test_events_arrive_as_soon_as_complete():
+    parser = PlaylistStreamParser()
+    assert parser.feed('{"name": "Roa') == []
+    assert parser.feed('d trip", "tracks": [{"name": "A", ') == [('name', 'Road trip')]
+    assert parser.feed('"artist": "B"}') == [('track', {'name': 'A', 'artist': 'B'})]
+
+
+def test_truncated_document_keeps_complete_tracks():
+    text = json.dumps(PLAYLIST)
+    cut = text.index('Why Does') + 5
+    assert feed_all([text[:cut]]) == expected_events(PLAYLIST)[:3]
+
+
+def test_tracks_before_name():
+    text = json.dumps({'tracks': PLAYLIST['tracks'][:1], 'name': 'Late'})
+    assert feed_all([text]) == [('track', PLAYLIST['tracks'][0]), ('name', 'Late')]
+
+
+def test_only_top_level_name_and_tracks_count():
+    text = json.dumps({
+        'meta': {'name': 'not this', 'tracks': [{'name': 'nor this', 'artist': 'x'}]},
+        'name': 'This one',
+        'tracks': [{'name': 'A', 'artist': 'B'}],
+    })
+    assert feed_all([text]) == [('name', 'This one'), ('track', {'name': 'A', 'artist': 'B'})]
+
+
+def test_malformed_track_is_skipped():
+    text = '{"name": "N", "tracks": [{"name": "A", "artist": }, {"name": "B", "artist": "C"}]}'
+    assert feed_all([text]) == [('name', 'N'), ('track', {'name': 'B', 'artist': 'C'})]
@@ -0,0 +1,92 @@
+import pytest
+
+from lib.track_matcher import (
+    best_match, clean_title, main_artist, query_tiers, score_candidate, title_similarity
+)
+
+
+def candidate(track_id, name, *artists, popularity=50):
+    return {'id': track_id, 'name': name, 'artists': [{'name': artist} for artist in artists],
+            'popularity': popularity}
+
+
+@pytest.mark.parametrize('title, cleaned', [
+    ('Hey Jude', 'Hey Jude'),
+    ('Hey Jude - Remastered 2015', 'Hey Jude'),
+    ('Umbrella (feat. JAY-Z)', 'Umbrella'),
+    ('Stay ft. Justin Bieber', 'Stay'),
+    ('Song [Live]', 'Song'),
+    ('Bohemian Rhapsody - Live Aid', 'Bohemian Rhapsody'),
+    # A title that is nothing but brackets is kept
+    ('(Untitled)', '(Untitled)'),
+])
+def test_clean_title(title, cleaned):
+    assert clean_title(title) == cleaned
+
+
+@pytest.mark.parametrize('artist, main', [
+    ('Adele', 'Adele'),
+    ('Rihanna feat. JAY-Z', 'Rihanna'),
+    ('Simon & Garfunkel', 'Simon'),
+    ('Daft Punk, Pharrell Williams', 'Daft Punk'),
+])
+def test_main_artist(artist, main):
+    assert main_artist(artist) == main
+
+
+@pytest.mark.parametrize('wanted, found', [
+    ('Song 10', 'Song 100'),
+    ('Part 1', 'Part 2'),
+    ('1999', '2000'),
+    ('Symphony No. 5', 'Symphony No. 9 - Remastered'),
+])
+def test_different_numbers_never_match(wanted, found):
+    assert title_similarity(wanted, found) == 0.0
+
+
+def test_versions_of_the_same_title_match():
+    assert title_similarity('Hey Jude', 'Hey Jude - Remastered 2015') == 1.0
+    assert title_similarity('Umbrella', 'Umbrella (feat. JAY-Z)') == 1.0
+    assert title_similarity('Café del Mar', 'cafe del mar') == 1.0
+
+
+def test_score_requires_title_and_artist():
+    assert score_candidate('Hey Jude', 'The Beatles', candidate('1', 'Hey Jude', 'The Beatles')) is not None
+    assert score_candidate('Hey Jude', 'The Beatles', candidate('1', 'Hey Jude', 'Wilson Pickett')) is None
+    assert score_candidate('Hey Jude', 'The Beatles', candidate('1', 'Let It Be', 'The Beatles')) is None
+    assert score_candidate('Hey Jude', 'The Beatles', {'id': '1', 'name': 'Hey Jude'}) is None
+
+
+def test_featured_artists_match_the_main_artist():
+    found = candidate('1', 'Umbrella', 'Rihanna', 'JAY-Z')
+    assert score_candidate('Umbrella (feat. JAY-Z)', 'Rihanna feat. JAY-Z', found) is not None
+    assert score_candidate('Umbrella', 'JAY-Z', found) is not None
+
+
+def test_best_match_prefers_the_artist_then_popularity():
+    candidates = [
+        candidate('tribute', 'Hey Jude', 'The Beatles Tribute', popularity=90),
+        candidate('original', 'Hey Jude', 'The Beatles', popularity=40),
+        # Remasters match the title as well as the original, so popularity decides
+        candidate('remaster', 'Hey Jude - Remastered 2015', 'The Beatles', popularity=60),
+        candidate('other', 'Hey Judy', 'The Beatles', popularity=100),
+    ]
+    assert best_match('Hey Jude', 'The Beatles', candidates) == 'remaster'
+    assert best_match('Hey Jude', 'The Beatles', candidates[:2]) == 'original'
+
+
+def test_best_match_without_a_match():
+    assert best_match('Song 10', 'Band', [candidate('1', 'Song 100', 'Band')]) is None
+    assert best_match('Song', 'Band', []) is None
+
+
+def test_query_tiers():
+    assert query_tiers('Hey Jude', 'The Beatles') == [
+        ('strict', 'track:Hey Jude artist:The Beatles'),
+        ('free_text', 'Hey Jude The Beatles'),
+    ]
+    assert query_tiers('Umbrella (feat. JAY-Z)', 'Rihanna, JAY-Z') == [
+        ('strict', 'track:Umbrella (feat. JAY-Z) artist:Rihanna, JAY-Z'),
+        ('cleaned', 'track:Umbrella artist:Rihanna'),
+        ('free_text', 'Umbrella Rihanna'),
+    ]
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import './App.css';
 import ArtistList from './components/ArtistList';
 import TabBar from './components/TabBar';
@@ -9,18 +9,46 @@ interface Artist {
   name: string;
   popularity: number;
   status: string;
-  images: Array<{ url: string }>;
+  thumbnail: string | null;
 }
 
 interface ArtistsResponse {
   artists: Artist[];
+  version: number;
 }
 
+interface ArtistChanges {
+  artists: Artist[];
+  version: number;
+  reset?: boolean;
+}
+
+const ARTIST_FIELDS = 'id,name,popularity,status,thumbnail';
+// Status clicks within this window are sent as one bulk update
+const STATUS_FLUSH_DELAY = 300;
+
+// Replace changed artists in place and append new ones, keeping popularity order
+const mergeArtists = (artists: Artist[], changed: Artist[]): Artist[] => {
+  const byId = new Map(changed.map(artist => [artist.id, artist]));
+  const merged = artists.map(artist => {
+    const update = byId.get(artist.id);
+    byId.delete(artist.id);
+    return update ? { ...artist, ...update } : artist;
+  });
+  if (byId.size === 0) {
+    return merged;
+  }
+  return [...merged, ...Array.from(byId.values())].sort((a, b) => b.popularity - a.popularity);
+};
+
 function App() {
   const [artists, setArtists] = useState<Artist[]>([]);
   const [activeTab, setActiveTab] = useState('artists');
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
+  const versionRef = useRef(0);
+  const pendingStatuses = useRef(new Map<string, string>());
+  const flushTimer = useRef<ReturnType<typeof setTimeout> | null>(null);
 
   useEffect(() => {
     fetchArtists();
@@ -29,11 +57,12 @@ function App() {
   const fetchArtists = async () => {
     try {
       setLoading(true);
-      const response = await fetch('http://localhost:8000/api/artists');
+      const response = await fetch(`http://localhost:8000/api/artists?fields=${ARTIST_FIELDS}`);
       if (!response.ok) {
         throw new Error('Failed to fetch artists');
       }
       const data: ArtistsResponse = await response.json();
+      versionRef.current = data.version;
       setArtists(data.artists);
       setError(null);
     } catch (err) {
@@ -43,25 +72,60 @@ function App() {
     }
   };
 
-  const handleStatusChange = async (artistId: string, status: string) => {
+  // Apply only what changed since the last version we have
+  const fetchChanges = async () => {
+    const response = await fetch(
+      `http://localhost:8000/api/artists/changes?since=${versionRef.current}&fields=${ARTIST_FIELDS}`
+    );
+    if (!response.ok) {
+      throw new Error('Failed to fetch artist changes');
+    }
+    const data: ArtistChanges = await response.json();
+    if (data.reset) {
+      await fetchArtists();
+      return;
+    }
+    versionRef.current = data.version;
+    setArtists(current => mergeArtists(current, data.artists));
+  };
+
+  const flushStatuses = async () => {
+    flushTimer.current = null;
+    const changes = Array.from(pendingStatuses.current, ([id, status]) => ({ id, status }));
+    pendingStatuses.current.clear();
+    if (changes.length === 0) {
+      return;
+    }
     try {
-      const response = await fetch(`http://localhost:8000/api/artists/${artistId}/status`, {
-        method: 'PUT',
+      const response = await fetch(`http://localhost:8000/api/artists/status?fields=${ARTIST_FIELDS}`, {
+        method: 'PATCH',
         headers: {
           'Content-Type': 'application/json',
         },
-        body: JSON.stringify({ status }),
+        body: JSON.stringify({ changes }),
       });
-
-      if (response.ok) {
-        fetchArtists(); // Refresh the list
+      if (!response.ok) {
+        throw new Error('Failed to update artist status');
       }
+      const data: ArtistChanges = await response.json();
+      setArtists(current => mergeArtists(current, data.artists));
+      // Pick up anything else that changed in between, e.g. from another tab
+      await fetchChanges();
     } catch (error) {
       setError('Failed to update artist status');
       console.error('Error updating status:', error);
     }
   };
 
+  const handleStatusChange = (artistId: string, status: string) => {
+    // Show the change right away and send it with any other clicks in the window
+    setArtists(current => current.map(artist => (artist.id === artistId ? { ...artist, status } : artist)));
+    pendingStatuses.current.set(artistId, status);
+    if (!flushTimer.current) {
+      flushTimer.current = setTimeout(flushStatuses, STATUS_FLUSH_DELAY);
+    }
+  };
+
   const handleSync = async () => {
     setLoading(true);
     setError(null);
@@ -125,7 +189,7 @@ function App() {
       <TabBar activeTab={activeTab} onTabChange={setActiveTab} />
       <div className="content">
         {activeTab === 'artists' ? (
-          <ArtistList artists={artists} onStatusChange={handleStatusChange} />
+          <ArtistList artists={artists} onStatusChange={handleStatusChange} onSynced={fetchChanges} />
         ) : (
           <GenerateTab />
         )}
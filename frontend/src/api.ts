@@ -1,4 +1,4 @@
-import { Artist, ArtistStatus } from './types';
+import { Artist, ArtistStatus, Job } from './types';
 
 const API_BASE_URL = process.env.REACT_APP_API_URL || '/api';
 
@@ -23,4 +23,23 @@ export const updateArtistStatus = async (artistId: string, status: ArtistStatus)
     if (!response.ok) {
         throw new Error('Failed to update artist status');
     }
-}; 
\ No newline at end of file
+}; 
+
+// Poll a background job until it completes; resolves with the job's result
+export const waitForJob = async (statusUrl: string, onProgress?: (job: Job) => void): Promise<any> => {
+    while (true) {
+        const response = await fetch(statusUrl);
+        if (!response.ok) {
+            throw new Error('Failed to fetch job status');
+        }
+        const job: Job = await response.json();
+        onProgress?.(job);
+        if (job.status === 'completed') {
+            return job.result;
+        }
+        if (job.status === 'failed') {
+            throw new Error(job.error || 'Job failed');
+        }
+        await new Promise(resolve => setTimeout(resolve, 1000));
+    }
+};
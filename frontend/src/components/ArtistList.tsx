@@ -1,17 +1,19 @@
 import React, { useState, useEffect } from 'react';
 import './ArtistList.css';
+import { waitForJob } from '../api';
 
 interface Artist {
   id: string;
   name: string;
   popularity: number;
   status: string;
-  images: Array<{ url: string }>;
+  thumbnail: string | null;
 }
 
 interface ArtistListProps {
   artists: Artist[];
   onStatusChange: (artistId: string, status: string) => void;
+  onSynced: () => Promise<void>;
 }
 
 const statusOptions = [
@@ -21,7 +23,7 @@ const statusOptions = [
   { value: 'neutral', label: 'Neutral', icon: '➖' },
 ];
 
-const ArtistList: React.FC<ArtistListProps> = ({ artists, onStatusChange }) => {
+const ArtistList: React.FC<ArtistListProps> = ({ artists, onStatusChange, onSynced }) => {
   const [selectedStatus, setSelectedStatus] = useState('');
   const [isSyncing, setIsSyncing] = useState(false);
 
@@ -38,11 +40,16 @@ const ArtistList: React.FC<ArtistListProps> = ({ artists, onStatusChange }) => {
       if (!response.ok) {
         throw new Error('Failed to sync artists');
       }
+
+      // The sync runs as a background job, wait for it to finish
+      const { status_url } = await response.json();
+      await waitForJob(`http://localhost:8000${status_url}`);
       
-      // Reload the page to show the updated artists
-      window.location.reload();
+      // Apply the synced artists without reloading the whole list
+      await onSynced();
     } catch (error) {
       console.error('Error syncing artists:', error);
+    } finally {
       setIsSyncing(false);
     }
   };
@@ -85,7 +92,7 @@ const ArtistList: React.FC<ArtistListProps> = ({ artists, onStatusChange }) => {
         {filteredArtists.map(artist => (
           <div key={artist.id} className="artist-card">
             <img
-              src={artist.images[0]?.url || '/default-artist.png'}
+              src={artist.thumbnail || '/default-artist.png'}
               alt={artist.name}
               className="artist-image"
             />
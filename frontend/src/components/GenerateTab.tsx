@@ -1,5 +1,6 @@
 import React, { useState } from 'react';
 import './GenerateTab.css';
+import { waitForJob } from '../api';
 
 const GenerateTab: React.FC = () => {
   const [request, setRequest] = useState('');
@@ -7,14 +8,19 @@ const GenerateTab: React.FC = () => {
   const [playlistName, setPlaylistName] = useState<string>('');
   const [isLoading, setIsLoading] = useState(false);
   const [isUploading, setIsUploading] = useState(false);
+  const [uploadStatus, setUploadStatus] = useState<string | null>(null);
   const [trackCount, setTrackCount] = useState(10);
   const [playlistUrl, setPlaylistUrl] = useState<string | null>(null);
+  // Set after the first upload of the generated tracks; later uploads update that Spotify
+  // playlist in place, and generating new tracks starts a new one
+  const [playlistId, setPlaylistId] = useState<string | null>(null);
   const [considerFavorites, setConsiderFavorites] = useState(false);
 
   const handleSubmit = async (e: React.FormEvent) => {
     e.preventDefault();
     setIsLoading(true);
     setPlaylistUrl(null);
+    setPlaylistId(null);
     try {
       const requestData = {
         request,
@@ -22,22 +28,44 @@ const GenerateTab: React.FC = () => {
         consider_favorites: considerFavorites
       };
 
-      const response = await fetch('http://localhost:8000/api/playlist/generate', {
+      setTracks([]);
+      setPlaylistName('');
+
+      const response = await fetch('http://localhost:8000/api/playlist/generate/stream', {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
         },
         body: JSON.stringify(requestData),
       });
-      const data = await response.json();
-      console.log('Received data:', data); // Debug log
-      
-      // Handle nested tracks structure
-      if (data.tracks && data.tracks.tracks && Array.isArray(data.tracks.tracks)) {
-        setTracks(data.tracks.tracks);
-        setPlaylistName(data.tracks.name || 'Generated Playlist');
-      } else {
-        console.error('Invalid response format:', data);
+      if (!response.ok || !response.body) {
+        throw new Error('Failed to generate playlist');
+      }
+
+      // Read server-sent events and show each track as soon as it arrives
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const messages = buffer.split('\n\n');
+        buffer = messages.pop() || '';
+        for (const message of messages) {
+          const event = message.match(/^event: (.*)$/m)?.[1];
+          const data = JSON.parse(message.match(/^data: (.*)$/m)?.[1] || 'null');
+          if (event === 'name') {
+            setPlaylistName(data || 'Generated Playlist');
+          } else if (event === 'track') {
+            setTracks(current => [...current, data]);
+          } else if (event === 'done') {
+            setTracks(data.tracks);
+            setPlaylistName(data.name || 'Generated Playlist');
+          } else if (event === 'error') {
+            console.error('Error generating playlist:', data);
+          }
+        }
       }
     } catch (error) {
       console.error('Error generating playlist:', error);
@@ -56,15 +84,24 @@ const GenerateTab: React.FC = () => {
         },
         body: JSON.stringify({ 
           tracks,
-          name: playlistName
+          name: playlistName,
+          playlist_id: playlistId
         }),
       });
-      const data = await response.json();
-      setPlaylistUrl(data.playlist_url);
+      if (!response.ok) {
+        throw new Error('Failed to upload playlist');
+      }
+
+      // The upload runs as a background job, show its progress until it finishes
+      const { status_url } = await response.json();
+      const result = await waitForJob(`http://localhost:8000${status_url}`, job => setUploadStatus(job.message));
+      setPlaylistUrl(result.playlist_url);
+      setPlaylistId(result.playlist_id);
     } catch (error) {
       console.error('Error uploading to Spotify:', error);
     } finally {
       setIsUploading(false);
+      setUploadStatus(null);
     }
   };
 
@@ -98,7 +135,7 @@ const GenerateTab: React.FC = () => {
           />
           Consider favorites
         </label>
-        <button type="submit" disabled={isLoading}>
+        <button type="submit" disabled={isLoading || isUploading}>
           {isLoading ? 'Generating...' : 'Generate Playlist'}
         </button>
       </form>
@@ -111,9 +148,9 @@ const GenerateTab: React.FC = () => {
               <button 
                 className="upload-button"
                 onClick={handleUploadToSpotify}
-                disabled={isUploading}
+                disabled={isUploading || isLoading}
               >
-                {isUploading ? 'Uploading...' : 'Upload to Spotify'}
+                {isUploading ? (uploadStatus || 'Uploading...') : (playlistId ? 'Update on Spotify' : 'Upload to Spotify')}
               </button>
             </div>
           </div>
@@ -10,4 +10,15 @@ export interface Artist {
     }>;
 }
 
-export type ArtistStatus = 'not_ranked' | 'like' | 'dislike' | 'neutral'; 
\ No newline at end of file
+export type ArtistStatus = 'not_ranked' | 'like' | 'dislike' | 'neutral'; 
+
+export interface Job {
+    id: string;
+    kind: string;
+    status: 'queued' | 'running' | 'completed' | 'failed';
+    progress: number;
+    total: number | null;
+    message: string | null;
+    result: any;
+    error: string | null;
+}
@@ -1,11 +1,26 @@
+import os
+import sys
+
 import streamlit as st
 
+# Reuse the backend's database and similarity engine
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+
+from lib.database import Database
+from lib.similarity import SimilarityEngine
+
 st.set_page_config(
     page_title="Playlist Recommender",
     page_icon="🎵",
     layout="wide"
 )
 
+
+@st.cache_resource
+def get_engine() -> SimilarityEngine:
+    return SimilarityEngine(Database())
+
+
 st.title("🎵 Playlist Recommender")
 st.write("Welcome to the Playlist Recommender app!")
 
@@ -14,5 +29,18 @@ user_input = st.text_input("Enter your favorite artist:", "Taylor Swift")
 
 if user_input:
     st.write(f"Looking for recommendations similar to {user_input}...")
-    # Placeholder for future recommendation logic
-    st.info("Recommendation feature coming soon!") 
\ No newline at end of file
+    engine = get_engine()
+    artist = engine.db.find_artist_by_name(user_input)
+    if artist is None:
+        st.warning(f"{user_input} is not in your synced artists yet")
+    else:
+        matches = engine.similar_to([artist['id']], k=10)
+        if not matches:
+            st.info("No similar artists found, sync your artists with related artists first")
+        for similar, score in matches:
+            columns = st.columns([1, 5])
+            if similar['thumbnail']:
+                columns[0].image(similar['thumbnail'], width=64)
+            columns[1].write(f"**{similar['name']}** ({score:.2f})")
+            if similar['genres']:
+                columns[1].caption(', '.join(similar['genres']))